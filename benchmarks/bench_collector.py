@@ -0,0 +1,90 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+#
+# MeshExporter.collector の処理時間がオブジェクト数に対して線形に増加することを確認するベンチマークです。
+#
+# 実行方法（どちらか）:
+#   blender -b --factory-startup --python benchmarks/bench_collector.py
+#   python benchmarks/bench_collector.py      ※ bpy モジュールがインストールされた Python
+# ================================================================================================================================
+import os
+import sys
+import time
+
+import bpy
+
+# アドインのパッケージを読み込めるようにリポジトリのルートを追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from io_scene_kicad import export_kicad
+
+# 計測するオブジェクト数
+SIZES = (100, 1000, 5000, 10000, 50000)
+# 1つの親にぶら下げる子オブジェクトの数
+CHILDREN_PER_PARENT = 9
+
+# シーンの全オブジェクト削除
+# ================================================================================================================================
+def clear_scene():
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+
+# 共有メッシュを持つオブジェクトを指定数生成（親1つに子を複数ぶら下げる）
+# ================================================================================================================================
+def build_scene(count):
+    clear_scene()
+    me = bpy.data.meshes.get("bench_mesh") or bpy.data.meshes.new("bench_mesh")
+    collection = bpy.context.scene.collection
+    parent = None
+    for inx in range(count):
+        obj = bpy.data.objects.new("obj_%06d" % inx, me)
+        collection.objects.link(obj)
+        # 親オブジェクトの切り替え
+        if inx % (CHILDREN_PER_PARENT + 1) == 0:
+            parent = obj
+            obj.location = (inx * 0.1, 0, 0)
+        else:
+            obj.parent = parent
+    bpy.context.view_layer.update()
+
+# collector の処理時間を計測
+# ================================================================================================================================
+def time_collector(use_worigin_to_center):
+    mexp = export_kicad.MeshExporter()
+    mexp.use_selection = False
+    mexp.fetch_children = True
+    mexp.use_worigin_to_center = use_worigin_to_center
+    sta = time.perf_counter()
+    mexp.collector(bpy.context)
+    return time.perf_counter() - sta
+
+# ================================================================================================================================
+def main():
+    print("%8s %12s %14s %12s %14s" % ("objects", "center[s]", "center[us/obj]", "origin[s]", "origin[us/obj]"))
+    for count in SIZES:
+        build_scene(count)
+        t_center = time_collector(True)
+        t_origin = time_collector(False)
+        print("%8d %12.4f %14.2f %12.4f %14.2f" % (
+            count, t_center, t_center / count * 1e6, t_origin, t_origin / count * 1e6))
+    clear_scene()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+#
+# エクスポートのベンチマークです。合成シーンを作成し、フェーズ毎の処理時間と三角形のスループットを計測します。
+#
+# フェーズ:
+#   collection    : MeshExporter.collector
+#   evaluation    : 依存グラフの評価と、三角形分割以外の抽出（モディファイア適用後のメッシュ取得、変換、マテリアル等）
+#   triangulation : 三角形分割と配列の一括取得（MeshExporter.mesh_arrays）
+#   formatting    : VRML テキストへの整形（メモリ上）
+#   io            : ファイルへの書き込み
+#
+# 実行方法（どちらか）:
+#   blender -b --factory-startup --python benchmarks/bench_export.py -- [オプション]
+#   python benchmarks/bench_export.py [オプション]      ※ bpy モジュールがインストールされた Python
+#
+# 例:
+#   ... --output results.json                        全シナリオを計測して保存
+#   ... --baseline baseline.json --threshold 0.15    基準値より 15% 以上遅いときは終了コード 1
+#   ... --scenario custom --objects 500 --side 32    任意の条件で計測
+# ================================================================================================================================
+import argparse
+import io
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import bpy
+from bpy_extras.io_utils import axis_conversion
+from mathutils import Matrix
+
+# アドインのパッケージを読み込めるようにリポジトリのルートを追加
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from io_scene_kicad import export_kicad
+from io_scene_kicad import vrml
+import benchutil
+import scenegen
+
+# 計測シナリオ（scenegen.build_scene の引数）
+SCENARIOS = {
+    # 小さな部品が多数
+    "many_small": {"objects": 2000, "side": 6, "materials": 8},
+    # リンク複製が多い（共有メッシュの再利用）
+    "linked": {"objects": 2000, "side": 12, "linked": 0.95, "materials": 4},
+    # 頂点数の多いメッシュ
+    "dense": {"objects": 4, "side": 400},
+    # 深い階層（子オブジェクトを含めた収集）
+    "hierarchy": {"objects": 2000, "side": 4, "depth": 10},
+    # モディファイアの評価
+    "subsurf": {"objects": 50, "side": 12, "subsurf": 2},
+}
+# 計測時のエクスポート設定
+EXPORT_OPTIONS = {
+    "use_selection": False,
+    "use_worigin_to_center": False,
+    "use_mesh_modifiers": True,
+    "fetch_children": True,
+    "use_instancing": True,
+}
+
+# スクリプト引数の取得（Blender から起動されたときは "--" 以降）
+# ================================================================================================================================
+def script_args():
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1:]
+    return sys.argv[1:]
+
+# フェーズ毎の時間の集計
+# ================================================================================================================================
+class PhaseTimer:
+    def __init__(self):
+        self.phases = {}
+
+    # 時間の加算
+    def add(self, phase, seconds):
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    # 関数を計測付きの関数で包む
+    def wrap(self, phase, func):
+        def timed(*args, **kwargs):
+            sta = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(phase, time.perf_counter() - sta)
+        return timed
+
+# エクスポートを1回実行してフェーズ毎の時間を計測
+# ================================================================================================================================
+def run_export(outdir):
+    timer = PhaseTimer()
+    mexp = export_kicad.MeshExporter()
+    for key, value in EXPORT_OPTIONS.items():
+        setattr(mexp, key, value)
+    mexp.global_matrix = axis_conversion(to_forward='Y', to_up='Z').to_4x4()
+    mexp.global_scale = Matrix.Scale(1 / 2.54, 4)
+    mexp.local_matrix = mexp.global_matrix * mexp.global_scale
+    # 三角形分割の時間を分けて計測する
+    mexp.mesh_arrays = timer.wrap("triangulation", mexp.mesh_arrays)
+
+    sta = time.perf_counter()
+    mexp.collector(bpy.context)
+    timer.add("collection", time.perf_counter() - sta)
+
+    sta = time.perf_counter()
+    mexp.depsgraph = bpy.context.evaluated_depsgraph_get()
+    timer.add("evaluation", time.perf_counter() - sta)
+
+    # 出力ファイル毎のオブジェクト
+    if len(mexp.target_objs) > 0:
+        groups = [(mexp.target_objs, Matrix.Translation((0, 0, 0)))]
+    else:
+        groups = [(objs, Matrix.Translation([-v for v in origin])) for origin, objs in mexp.origin_objs.items()]
+
+    counts = {"files": 0, "triangles": 0, "vertices": 0, "bytes": 0}
+    for inx, (objs, local_origin) in enumerate(groups):
+        sta = time.perf_counter()
+        state = mexp.extract_objects(objs, local_origin)
+        timer.add("evaluation", time.perf_counter() - sta)
+
+        sta = time.perf_counter()
+        buffer = io.StringIO()
+        fw = vrml.VrmlWriter(buffer, compact=mexp.use_compact)
+        vrml.write_scene(fw, state.scene)
+        fw.flush()
+        text = buffer.getvalue()
+        timer.add("formatting", time.perf_counter() - sta)
+
+        sta = time.perf_counter()
+        with open(os.path.join(outdir, "bench_%06d.wrl" % inx), 'w', encoding='utf-8') as file:
+            file.write(text)
+        timer.add("io", time.perf_counter() - sta)
+
+        counts["files"] += 1
+        counts["bytes"] += len(text.encode('utf-8'))
+        for mesh in state.scene.meshes:
+            if not mesh.co is None:
+                # マテリアル毎に分割したときは部分毎の三角形数の合計
+                parts = [mesh] if mesh.parts is None else mesh.parts
+                counts["triangles"] += sum(len(part.tris) for part in parts)
+                counts["vertices"] += len(mesh.co)
+
+    # 評価時間には三角形分割の時間が含まれるので差し引く
+    timer.phases["evaluation"] -= timer.phases.get("triangulation", 0.0)
+    return timer.phases, counts
+
+# シナリオの計測（繰り返しのうちフェーズ毎の最小値を採る）
+# ================================================================================================================================
+def run_scenario(name, params, repeat, outdir):
+    scene = scenegen.build_scene(**params)
+    best = None
+    for inx in range(max(1, repeat)):
+        phases, counts = run_export(outdir)
+        if best is None:
+            best = phases
+        else:
+            best = {phase: min(best.get(phase, value), value) for phase, value in phases.items()}
+    total = sum(best.values())
+    result = {
+        "params": params,
+        "scene": scene,
+        "phases": best,
+        "total": total,
+        "tris_per_sec": counts["triangles"] / total if total > 0 else 0.0,
+    }
+    result.update(counts)
+    print("%-12s %8d tris %8.4f s %12.0f tris/s  " % (name, counts["triangles"], total, result["tris_per_sec"])
+          + " ".join("%s=%.4f" % (phase, value) for phase, value in sorted(best.items())), flush=True)
+    return result
+
+# ================================================================================================================================
+def main(argv):
+    parser = argparse.ArgumentParser(prog="bench_export.py")
+    parser.add_argument("--scenario", action="append", default=None,
+                        help="scenario name (%s, custom); repeatable" % ", ".join(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default=None, help="write results as JSON")
+    parser.add_argument("--baseline", default=None, help="compare against a stored result JSON")
+    parser.add_argument("--threshold", type=float, default=benchutil.DEFAULT_THRESHOLD)
+    parser.add_argument("--min-delta", type=float, default=benchutil.DEFAULT_MIN_DELTA)
+    # custom シナリオの条件
+    for key, value in scenegen.DEFAULTS.items():
+        parser.add_argument("--" + key, type=type(value), default=value)
+    args = parser.parse_args(argv)
+
+    scenarios = {}
+    for name in (args.scenario or list(SCENARIOS)):
+        if name == "custom":
+            scenarios[name] = {key: getattr(args, key) for key in scenegen.DEFAULTS}
+        elif name in SCENARIOS:
+            scenarios[name] = SCENARIOS[name]
+        else:
+            parser.error("unknown scenario: %s" % name)
+
+    results = {
+        "version": benchutil.RESULT_VERSION,
+        "blender": bpy.app.version_string,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "repeat": args.repeat,
+        "scenarios": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="bench_export_") as outdir:
+        for name, params in scenarios.items():
+            results["scenarios"][name] = run_scenario(name, params, args.repeat, outdir)
+    scenegen.clear_scene()
+
+    if not args.output is None:
+        benchutil.save_results(args.output, results)
+    if not args.baseline is None:
+        rows, regressions = benchutil.compare(results, benchutil.load_results(args.baseline), args.threshold, args.min_delta)
+        benchutil.print_comparison(rows, regressions)
+        return 1 if len(regressions) > 0 else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(script_args()))
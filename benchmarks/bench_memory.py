@@ -0,0 +1,127 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+#
+# 分割出力（chunk_size）のメモリ使用量の確認です。大きさの異なる合成メッシュを出力し、
+# 整形・出力中のメモリ使用量のピーク（入力の配列を除く）を tracemalloc で計測します。
+# 分割出力ではピークがメッシュの大きさに依存しないことを確認し、比例して増えるときは終了コード 1 を返します。
+#
+# bpy を使わないので、通常の Python（NumPy が必要）で実行できます。
+#
+# 実行方法:
+#   python benchmarks/bench_memory.py [--sizes 50000 200000 800000] [--chunk-size 4096] [--decimals 4]
+# ================================================================================================================================
+import argparse
+import os
+import sys
+import tracemalloc
+
+import numpy as np
+
+# バックエンドは bpy に依存しないので、パッケージを経由せずに直接読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "io_scene_kicad"))
+import sceneir
+import vrml
+
+# 最小サイズのピークに対して許容する増加の割合
+DEFAULT_GROWTH = 1.5
+
+# 書き込み内容を捨てるファイル（ファイル I/O を計測に含めない）
+# ================================================================================================================================
+class NullFile:
+    def __init__(self):
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+
+    def close(self):
+        pass
+
+# 合成メッシュの作成（格子状の頂点と三角形）
+# ================================================================================================================================
+def build_mesh(vertices):
+    side = max(int(np.sqrt(vertices)), 2)
+    grid = np.arange(side, dtype=np.float32) * np.float32(0.1234567)
+    xs, ys = np.meshgrid(grid, grid)
+    co = np.stack([xs.ravel(), ys.ravel(), np.sin(xs.ravel() * ys.ravel())], axis=1).astype(np.float32)
+    base = (np.arange(side - 1)[:, None] * side + np.arange(side - 1)[None, :]).ravel()
+    tris = np.concatenate([
+        np.stack([base, base + 1, base + side], axis=1),
+        np.stack([base + 1, base + side + 1, base + side], axis=1),
+    ]).astype(np.int32)
+    mesh = sceneir.MeshRecord("Mesh")
+    mesh.translation.append((0, 0, 0))
+    mesh.rotation.append((0, 0, 1, 0))
+    mesh.co = co
+    mesh.tris = tris
+    return mesh
+
+# 1つのメッシュを出力したときのメモリ使用量のピーク（バイト）
+# ================================================================================================================================
+def measure(mesh, chunk_size, decimals):
+    scene = sceneir.SceneIR()
+    scene.meshes.append(mesh)
+    scene.decimals = decimals
+    scene.chunk_size = chunk_size
+    file = NullFile()
+    tracemalloc.start()
+    try:
+        fw = vrml.VrmlWriter(file)
+        vrml.write_scene(fw, scene, None)
+        fw.flush()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak, file.size
+
+# ================================================================================================================================
+def main(argv):
+    parser = argparse.ArgumentParser(description="chunked output memory check")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50000, 200000, 800000], help="vertex counts")
+    parser.add_argument("--chunk-size", type=int, default=4096, help="rows per chunk")
+    parser.add_argument("--decimals", type=int, default=None, help="decimal places (default: 6 significant digits)")
+    parser.add_argument("--growth", type=float, default=DEFAULT_GROWTH, help="allowed peak growth over the smallest size")
+    args = parser.parse_args(argv)
+
+    rows = []
+    for size in sorted(args.sizes):
+        mesh = build_mesh(size)
+        whole, whole_size = measure(mesh, 0, args.decimals)
+        chunked, chunked_size = measure(mesh, args.chunk_size, args.decimals)
+        # 分割しても出力内容は変わらない
+        if whole_size != chunked_size:
+            print("output size mismatch: %d != %d" % (whole_size, chunked_size))
+            return 1
+        rows.append((len(mesh.co), whole, chunked))
+
+    print("%12s %14s %14s" % ("vertices", "whole [KiB]", "chunked [KiB]"))
+    for vertices, whole, chunked in rows:
+        print("%12d %14.1f %14.1f" % (vertices, whole / 1024, chunked / 1024))
+
+    # 分割出力のピークが最小サイズのときから一定の割合を超えて増えていないか
+    limit = rows[0][2] * args.growth
+    if rows[-1][2] > limit:
+        print("chunked peak grows with mesh size: %.1f KiB > %.1f KiB" % (rows[-1][2] / 1024, limit / 1024))
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
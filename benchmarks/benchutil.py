@@ -0,0 +1,99 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+#
+# ベンチマーク結果の保存と基準値（ベースライン）との比較
+# bpy に依存しないので、結果ファイル同士の比較は通常の Python で実行できます。
+#
+# 実行方法:
+#   python benchmarks/benchutil.py results.json baseline.json [--threshold 0.15]
+# ================================================================================================================================
+import argparse
+import json
+import sys
+
+# 結果の形式バージョン
+RESULT_VERSION = 1
+# 既定の許容する遅延の割合（15%）
+DEFAULT_THRESHOLD = 0.15
+# 比較しない微小な時間差（秒）。短い計測値の揺らぎで誤検出しないため
+DEFAULT_MIN_DELTA = 0.005
+
+# 結果の読み込み
+# ================================================================================================================================
+def load_results(path):
+    with open(path, 'r', encoding='utf-8') as file:
+        results = json.load(file)
+    if results.get("version") != RESULT_VERSION:
+        raise ValueError("unsupported result version: %r" % results.get("version"))
+    return results
+
+# 結果の保存
+# ================================================================================================================================
+def save_results(path, results):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=1, sort_keys=True)
+
+# 基準値との比較（フェーズ毎と合計の時間。スループットは合計時間に比例するので合計で判定する）
+# 戻り値: (比較結果の行のリスト, 劣化した項目のリスト)
+# ================================================================================================================================
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta=DEFAULT_MIN_DELTA):
+    rows = []
+    regressions = []
+    for name, scenario in sorted(results["scenarios"].items()):
+        base = baseline["scenarios"].get(name)
+        # 基準値にないシナリオは比較しない
+        if base is None:
+            continue
+        items = [(phase, value, base["phases"].get(phase)) for phase, value in sorted(scenario["phases"].items())]
+        items.append(("total", scenario["total"], base.get("total")))
+        for phase, value, base_value in items:
+            if base_value is None:
+                continue
+            ratio = value / base_value if base_value > 0 else float("inf") if value > 0 else 1.0
+            regressed = (value - base_value > min_delta) and (ratio > 1.0 + threshold)
+            rows.append((name, phase, base_value, value, ratio, regressed))
+            if regressed:
+                regressions.append((name, phase, base_value, value, ratio))
+    return rows, regressions
+
+# 比較結果の表示
+# ================================================================================================================================
+def print_comparison(rows, regressions, file=sys.stdout):
+    print("%-16s %-14s %12s %12s %8s" % ("scenario", "phase", "base[s]", "new[s]", "ratio"), file=file)
+    for name, phase, base_value, value, ratio, regressed in rows:
+        print("%-16s %-14s %12.4f %12.4f %8.2f%s" % (name, phase, base_value, value, ratio, "  << REGRESSION" if regressed else ""), file=file)
+    if len(regressions) > 0:
+        print("%d regression(s)" % len(regressions), file=file)
+
+# ================================================================================================================================
+def main(argv):
+    parser = argparse.ArgumentParser(prog="benchutil.py")
+    parser.add_argument("results")
+    parser.add_argument("baseline")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--min-delta", type=float, default=DEFAULT_MIN_DELTA)
+    args = parser.parse_args(argv)
+    rows, regressions = compare(load_results(args.results), load_results(args.baseline), args.threshold, args.min_delta)
+    print_comparison(rows, regressions)
+    return 1 if len(regressions) > 0 else 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
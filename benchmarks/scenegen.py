@@ -0,0 +1,122 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+#
+# ベンチマーク用の合成シーン生成
+# オブジェクト数、頂点数、階層の深さ、リンク複製の割合、マテリアル数、モディファイアを指定してシーンを作成します。
+# ================================================================================================================================
+import math
+
+import bpy
+import numpy as np
+
+# 生成するシーンの既定値
+DEFAULTS = {
+    # オブジェクト数
+    "objects": 100,
+    # 格子メッシュの一辺の頂点数（頂点数は side * side、四角形は (side - 1) ^ 2）
+    "side": 16,
+    # 階層の深さ（1 のときは全て最上位）
+    "depth": 1,
+    # 他のオブジェクトとメッシュデータを共有する（リンク複製の）割合 0.0 ～ 1.0
+    "linked": 0.0,
+    # マテリアル数
+    "materials": 1,
+    # サブディビジョンサーフェスのレベル（0 のときはモディファイアなし）
+    "subsurf": 0,
+}
+
+# シーンの全オブジェクト・メッシュ・マテリアルを削除
+# ================================================================================================================================
+def clear_scene():
+    for obj in list(bpy.data.objects):
+        bpy.data.objects.remove(obj, do_unlink=True)
+    for me in list(bpy.data.meshes):
+        bpy.data.meshes.remove(me)
+    for mat in list(bpy.data.materials):
+        bpy.data.materials.remove(mat)
+
+# 格子状のメッシュを作成（平面ではなく起伏を付ける）
+# ================================================================================================================================
+def grid_mesh(name, side, seed=0):
+    side = max(2, side)
+    xs = np.linspace(0.0, 1.0, side)
+    x, y = np.meshgrid(xs, xs)
+    z = 0.05 * np.sin(x * 6.0 + seed) * np.cos(y * 6.0)
+    co = np.stack([x.ravel(), y.ravel(), z.ravel()], axis=1)
+    index = np.arange(side * side).reshape(side, side)
+    quads = np.stack([index[:-1, :-1], index[:-1, 1:], index[1:, 1:], index[1:, :-1]], axis=-1).reshape(-1, 4)
+    me = bpy.data.meshes.new(name)
+    me.from_pydata(co.tolist(), [], quads.tolist())
+    me.update()
+    return me
+
+# 合成シーンの作成
+# 戻り値: 作成したシーンの概要（オブジェクト数、メッシュ数、元メッシュの三角形数の合計）
+# ================================================================================================================================
+def build_scene(**params):
+    settings = dict(DEFAULTS)
+    settings.update(params)
+    count = settings["objects"]
+    depth = max(1, settings["depth"])
+    clear_scene()
+
+    # マテリアル
+    materials = []
+    for inx in range(max(0, settings["materials"])):
+        mat = bpy.data.materials.new("bench_mat_%03d" % inx)
+        mat.diffuse_color = ((inx * 0.37) % 1.0, (inx * 0.61) % 1.0, (inx * 0.13) % 1.0, 1.0)
+        materials.append(mat)
+
+    # メッシュデータ（リンク複製の割合に応じて共有する）
+    meshes = []
+    mesh_count = max(1, int(round(count * (1.0 - settings["linked"]))))
+    for inx in range(mesh_count):
+        me = grid_mesh("bench_mesh_%06d" % inx, settings["side"], seed=inx)
+        if len(materials) > 0:
+            me.materials.append(materials[inx % len(materials)])
+        meshes.append(me)
+
+    # オブジェクト（depth 個ずつ親子の連鎖にする）
+    collection = bpy.context.scene.collection
+    columns = max(1, int(math.ceil(math.sqrt(count / depth))))
+    parent = None
+    for inx in range(count):
+        obj = bpy.data.objects.new("bench_obj_%06d" % inx, meshes[inx % mesh_count])
+        collection.objects.link(obj)
+        if inx % depth == 0:
+            root = inx // depth
+            obj.location = ((root % columns) * 2.0, (root // columns) * 2.0, 0.0)
+            parent = None
+        else:
+            obj.parent = parent
+            obj.location = (0.1, 0.0, 0.05)
+        parent = obj
+        if settings["subsurf"] > 0:
+            mod = obj.modifiers.new("bench_subsurf", 'SUBSURF')
+            mod.levels = settings["subsurf"]
+    bpy.context.view_layer.update()
+
+    side = max(2, settings["side"])
+    return {
+        "objects": count,
+        "meshes": mesh_count,
+        "source_triangles": count * (side - 1) * (side - 1) * 2,
+    }
@@ -37,6 +37,7 @@ bl_info = {
 
 import os
 import re
+import time
 import webbrowser
 from . import localeui
 
@@ -50,6 +51,8 @@ from bpy.props import (
     StringProperty,
     BoolProperty,
     FloatProperty,
+    IntProperty,
+    EnumProperty,
 )
 from bpy_extras.io_utils import (
     ExportHelper,
@@ -58,18 +61,25 @@ from bpy_extras.io_utils import (
     path_reference_mode
 )
 
+# バックグラウンド出力のタイマー間隔（秒）と、1回のタイマーで処理を続ける時間（秒）
+# ※処理時間に対して画面更新の割合を小さくし、一括出力とほぼ同じ速度を保つ
+MODAL_INTERVAL = 0.01
+MODAL_SLICE = 0.25
+
 # ================================================================================================================================
 @orientation_helper(axis_forward='Y', axis_up='Z')
 class ExportWRL(bpy.types.Operator, ExportHelper):
     bl_idname = "export_scene.wrl"
     bl_label = "WRLをエクスポート"
     filename_ext = ".wrl"
+    # 拡張子は check() で圧縮の有無に合わせて切り替える
+    check_extension = None
 
     def checkChangeCallback(self, context):
         o = self.use_worigin_to_center
 
     filter_glob: StringProperty(
-        default="*.wrl",
+        default="*.wrl;*.wrl.gz",
         options={'HIDDEN'},
     ) # type: ignore
     # オプション：選択のみ 初期値 False
@@ -117,6 +127,170 @@ KiCadの3Dモデルを生成するためのスケールをBlenderでの1単位
         min=0.01, max=1000.0,
         default=0.393700,
     ) # type: ignore
+    # オプション：同じメッシュを共有するオブジェクトのジオメトリを DEF/USE で再利用。初期値 True
+    use_instancing: BoolProperty(
+        name=localeui.gtext("use_instancing", "共有メッシュを再利用"),
+        description=localeui.gtext("desc_instancing", "同じメッシュデータを持つオブジェクトのジオメトリを1回だけ出力し、DEF/USEで参照します"),
+        default=True,
+    ) # type: ignore
+    # オプション：内容が同じジオメトリを重複排除。初期値 False
+    use_dedup_geometry: BoolProperty(
+        name=localeui.gtext("use_dedup_geometry", "同一形状の重複排除"),
+        description=localeui.gtext("desc_dedup_geometry", "メッシュデータが異なっても形状が同じジオメトリ（平行移動のみの複製を含む）を1回だけ出力し、DEF/USEで参照します"),
+        default=False,
+    ) # type: ignore
+    # オプション：差分エクスポート。初期値 False
+    use_incremental: BoolProperty(
+        name=localeui.gtext("use_incremental", "差分エクスポート"),
+        description=localeui.gtext("desc_incremental", "原点別にファイルを出力するとき、前回のエクスポートから変更のあったファイルのみを出力します（出力先にマニフェストを保存します）"),
+        default=False,
+    ) # type: ignore
+    # オプション：テッセレーションキャッシュを使用。初期値 False
+    use_tess_cache: BoolProperty(
+        name=localeui.gtext("use_tess_cache", "キャッシュを使用"),
+        description=localeui.gtext("desc_tess_cache", "変更のないメッシュは前回エクスポート時に整形したジオメトリをディスクキャッシュから再利用します"),
+        default=False,
+    ) # type: ignore
+    # オプション：キャッシュディレクトリ。初期値 ""（~/.cache/io_scene_kicad）
+    cache_dir: StringProperty(
+        name=localeui.gtext("cache_dir", "キャッシュフォルダ"),
+        description=localeui.gtext("desc_cache_dir", "キャッシュを保存するフォルダ。空のときは ~/.cache/io_scene_kicad を使います"),
+        subtype='DIR_PATH',
+        default="",
+    ) # type: ignore
+    # オプション：キャッシュサイズの上限(MB)。初期値 512
+    cache_size: IntProperty(
+        name=localeui.gtext("cache_size", "キャッシュ上限(MB)"),
+        description=localeui.gtext("desc_cache_size", "キャッシュの合計サイズの上限。超えたときは最後に使われた時刻が古いものから削除します"),
+        min=1, max=1000000,
+        default=512,
+    ) # type: ignore
+    # オプション：バックグラウンドで出力。初期値 False
+    use_modal: BoolProperty(
+        name=localeui.gtext("use_modal", "バックグラウンドで出力"),
+        description=localeui.gtext("desc_modal", "画面を更新しながら出力し、進捗をステータスバーに表示します（Esc キーで中止します。書き出しを完了したファイルは残し、書きかけのファイルは残しません）"),
+        default=False,
+    ) # type: ignore
+    # オプション：原点別ファイルを書き出すワーカー数。初期値 0（CPU 数）
+    workers: IntProperty(
+        name=localeui.gtext("workers", "並列書き出し数"),
+        description=localeui.gtext("desc_workers", "原点別にファイルを出力するとき、並行して整形・書き込みを行うファイル数。0 のときは CPU 数に合わせます"),
+        min=0, max=64,
+        default=0,
+    ) # type: ignore
+    # オプション：計測。初期値 False
+    use_profile: BoolProperty(
+        name=localeui.gtext("use_profile", "処理時間を計測"),
+        description=localeui.gtext("desc_profile", "フェーズ毎の処理時間、頂点数・三角形数、出力サイズ、メモリ使用量を計測し、概要をレポートに出力します"),
+        default=False,
+    ) # type: ignore
+    # オプション：計測結果のファイル出力。初期値 'NONE'
+    profile_output: EnumProperty(
+        name=localeui.gtext("profile_output", "計測結果の保存"),
+        description=localeui.gtext("desc_profile_output", "計測結果を出力ファイルと同じフォルダに保存します"),
+        items=(
+            ('NONE', localeui.gtext("profile_output_none", "保存しない"), ""),
+            ('JSON', localeui.gtext("profile_output_json", "JSON (.profile.json)"), ""),
+            ('TRACE', localeui.gtext("profile_output_trace", "Chrome トレース (.trace.json)"), ""),
+        ),
+        default='NONE',
+    ) # type: ignore
+    # オプション：gzip 圧縮。初期値 False
+    use_gzip: BoolProperty(
+        name=localeui.gtext("use_gzip", "gzip 圧縮 (.wrl.gz)"),
+        description=localeui.gtext("desc_gzip", "出力ファイルを gzip で圧縮します。圧縮は書き出しと並行して別スレッドで行います"),
+        default=False,
+    ) # type: ignore
+    # オプション：圧縮レベル。初期値 6
+    compress_level: IntProperty(
+        name=localeui.gtext("compress_level", "圧縮レベル"),
+        description=localeui.gtext("desc_compress_level", "gzip の圧縮レベル（1: 高速 ～ 9: 高圧縮）"),
+        min=1, max=9,
+        default=6,
+    ) # type: ignore
+    # オプション：頂点座標の量子化。初期値 'NONE'
+    quantize: EnumProperty(
+        name=localeui.gtext("quantize", "頂点座標の量子化"),
+        description=localeui.gtext("desc_quantize", "頂点座標を丸めて出力し、丸めて同じ位置になった頂点をまとめます。まとめて潰れた面は取り除きます（値は出力ファイルに書き出す座標値の単位。「トランスフォームを頂点に適用」が無効のときは、Transform ノードでスケールされる前のメッシュのローカル座標に適用します）"),
+        items=(
+            ('NONE', localeui.gtext("quantize_none", "しない（有効数字6桁）"), ""),
+            ('DECIMALS', localeui.gtext("quantize_decimals", "小数点以下の桁数"), ""),
+            ('GRID', localeui.gtext("quantize_grid", "格子間隔"), ""),
+        ),
+        default='NONE',
+    ) # type: ignore
+    # オプション：量子化する小数点以下の桁数。初期値 4
+    decimals: IntProperty(
+        name=localeui.gtext("decimals", "小数点以下の桁数"),
+        description=localeui.gtext("desc_decimals", "頂点座標を丸める小数点以下の桁数"),
+        min=0, max=9,
+        default=4,
+    ) # type: ignore
+    # オプション：量子化する格子間隔。初期値 0.001
+    grid_step: FloatProperty(
+        name=localeui.gtext("grid_step", "格子間隔"),
+        description=localeui.gtext("desc_grid_step", "頂点座標を丸める格子の間隔"),
+        min=0.000001, max=100.0,
+        precision=6,
+        default=0.001,
+    ) # type: ignore
+    # オプション：トランスフォームを頂点に適用。初期値 False
+    use_bake_transforms: BoolProperty(
+        name=localeui.gtext("use_bake_transforms", "トランスフォームを頂点に適用"),
+        description=localeui.gtext("desc_bake_transforms", "位置・回転・スケールを頂点座標に適用し、Transform ノードを使わずに出力します（せん断や不均一なスケールも正確に出力します）"),
+        default=False,
+    ) # type: ignore
+    # オプション：シェイプの統合。初期値 False
+    use_merge_shapes: BoolProperty(
+        name=localeui.gtext("use_merge_shapes", "シェイプを統合"),
+        description=localeui.gtext("desc_merge_shapes", "トランスフォームを頂点に適用し、同じマテリアルのオブジェクトを1つの Shape にまとめてノード数を減らします"),
+        default=False,
+    ) # type: ignore
+    # オプション：マテリアル毎に分割。初期値 True
+    use_material_split: BoolProperty(
+        name=localeui.gtext("use_material_split", "マテリアル毎に分割"),
+        description=localeui.gtext("desc_material_split", "複数のマテリアルを使うメッシュをマテリアル毎の Shape に分けて出力します（無効時は最初のマテリアルのみ）。分割したメッシュはキャッシュを使いません"),
+        default=True,
+    ) # type: ignore
+    # オプション：多角形のまま出力。初期値 False
+    use_ngons: BoolProperty(
+        name=localeui.gtext("use_ngons", "多角形のまま出力"),
+        description=localeui.gtext("desc_ngons", "平面かつ凸の四角形・多角形を三角形分割せずに出力します（平面でない面・凹んだ面は三角形分割します）"),
+        default=False,
+    ) # type: ignore
+    # オプション：メッシュのクリーンアップ。初期値 False
+    use_cleanup: BoolProperty(
+        name=localeui.gtext("use_cleanup", "メッシュのクリーンアップ"),
+        description=localeui.gtext("desc_cleanup", "面積ゼロの三角形、重複した三角形、どの面にも使われていない頂点を取り除きます"),
+        default=False,
+    ) # type: ignore
+    # オプション：分割出力の行数。初期値 0（分割しない）
+    chunk_size: IntProperty(
+        name=localeui.gtext("chunk_size", "分割出力の行数"),
+        description=localeui.gtext("desc_chunk_size", "大きなメッシュの頂点座標・インデックスを指定した行数毎に整形して書き出し、整形中のメモリ使用量を抑えます（0 のときは分割しません。出力内容は変わりません）"),
+        min=0, max=10000000,
+        default=0,
+    ) # type: ignore
+    # オプション：コンパクト出力。初期値 False
+    use_compact: BoolProperty(
+        name=localeui.gtext("use_compact", "コンパクト出力"),
+        description=localeui.gtext("desc_compact", "インデントを省略してファイルサイズを小さくします（機械読み込み専用のファイル向け）"),
+        default=False,
+    ) # type: ignore
+    # 圧縮の有無に合わせて拡張子（.wrl / .wrl.gz）を切り替える
+    # ------------------------------------------------------------------------------------------------
+    def check(self, context):
+        change_axis = ExportHelper.check(self, context)
+        filepath = self.filepath
+        if os.path.basename(filepath):
+            mcx = re.search(r"([.]wrl)?[.]gz$", filepath, re.IGNORECASE)
+            title = filepath[:mcx.start()] if mcx else os.path.splitext(filepath)[0]
+            filepath = title + (".wrl.gz" if self.use_gzip else self.filename_ext)
+            if filepath != self.filepath:
+                self.filepath = filepath
+                return True
+        return change_axis
+
     # ------------------------------------------------------------------------------------------------
     def execute(self, context):
         from . import export_kicad
@@ -129,14 +303,104 @@ KiCadの3Dモデルを生成するためのスケールをBlenderでの1単位
             "use_mesh_modifiers": self.use_mesh_modifiers,
             "use_worigin_to_center": self.use_worigin_to_center,
             "color_mag": self.color_mag,
+            "use_compact": self.use_compact,
+            "use_instancing": self.use_instancing,
+            "use_dedup_geometry": self.use_dedup_geometry,
+            "use_tess_cache": self.use_tess_cache,
+            "use_incremental": self.use_incremental,
+            "cache_dir": self.cache_dir,
+            "cache_size": self.cache_size,
+            "workers": self.workers,
+            "use_gzip": self.use_gzip,
+            "compress_level": self.compress_level,
+            "quantize": self.quantize,
+            "decimals": self.decimals,
+            "grid_step": self.grid_step,
+            "use_cleanup": self.use_cleanup,
+            "use_ngons": self.use_ngons,
+            "use_material_split": self.use_material_split,
+            "use_bake_transforms": self.use_bake_transforms,
+            "use_merge_shapes": self.use_merge_shapes,
+            "chunk_size": self.chunk_size,
+            "use_profile": self.use_profile,
+            "profile_output": self.profile_output,
         }
         keywords["global_matrix"] = axis_conversion(to_forward=self.axis_forward,
                                         to_up=self.axis_up,
                                         ).to_4x4()
         keywords["global_scale"] =  Matrix.Scale(self.global_scale, 4)
 
+        # バックグラウンドで出力するとき（Blender をバックグラウンドで実行中は一括で出力する）
+        if self.use_modal and not bpy.app.background:
+            return self.modal_begin(context, export_kicad.iter_save(self, context, **keywords))
         return export_kicad.save(self, context, **keywords)
 
+    # バックグラウンド出力の開始（タイマー毎にエクスポートのジェネレーターを一定時間ずつ進める）
+    # ※依存グラフの取得とオブジェクトの収集は、実行時のコンテキストで最初の1ステップとして行う
+    # ------------------------------------------------------------------------------------------------
+    def modal_begin(self, context, steps):
+        try:
+            progress = next(steps)
+        except StopIteration as e:
+            return e.value
+        self._steps = steps
+        self._total = None
+        self.modal_progress(context, progress)
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(MODAL_INTERVAL, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+
+    # バックグラウンド出力の終了
+    # ------------------------------------------------------------------------------------------------
+    def modal_end(self, context):
+        wm = context.window_manager
+        wm.event_timer_remove(self._timer)
+        if not self._total is None:
+            wm.progress_end()
+        context.workspace.status_text_set(None)
+
+    # ------------------------------------------------------------------------------------------------
+    def modal(self, context, event):
+        # Esc キーで中止（書き出し中のファイルの完了はジェネレーターの終了処理で待つ）
+        if event.type == 'ESC':
+            self.modal_end(context)
+            self._steps.close()
+            self.report({'WARNING'}, localeui.gtext("ExportCancelled", "エクスポートを中止しました。"))
+            return {'CANCELLED'}
+        # 出力中は他の操作を受け付けない（抽出中のオブジェクトを変更させない）
+        if event.type != 'TIMER':
+            return {'RUNNING_MODAL'}
+
+        # 一定時間処理を進める
+        deadline = time.perf_counter() + MODAL_SLICE
+        try:
+            while True:
+                progress = next(self._steps)
+                if time.perf_counter() >= deadline:
+                    break
+        except StopIteration as e:
+            self.modal_end(context)
+            return e.value
+        except BaseException:
+            self.modal_end(context)
+            self._steps.close()
+            raise
+
+        self.modal_progress(context, progress)
+        return {'RUNNING_MODAL'}
+
+    # 進捗の表示
+    # ------------------------------------------------------------------------------------------------
+    def modal_progress(self, context, progress):
+        wm = context.window_manager
+        if self._total is None:
+            self._total = max(progress["total"], 1)
+            wm.progress_begin(0, self._total)
+        wm.progress_update(min(progress["objects"], self._total))
+        progress_msg = localeui.gtext("ExportProgress", "エクスポート中: %(objects)d / %(total)d オブジェクト, %(triangles)d 三角形（Esc キーで中止）")
+        context.workspace.status_text_set(progress_msg % progress)
+
     # ------------------------------------------------------------------------------------------------
     def draw(self, context):
         layout = self.layout
@@ -148,6 +412,28 @@ KiCadの3Dモデルを生成するためのスケールをBlenderでの1単位
         layout.prop(self, "axis_forward")
         layout.prop(self, "axis_up")
         layout.prop(self, "global_scale")
+        layout.prop(self, "use_instancing")
+        layout.prop(self, "use_dedup_geometry")
+        layout.prop(self, "use_compact")
+        layout.prop(self, "use_gzip")
+        layout.prop(self, "compress_level")
+        layout.prop(self, "chunk_size")
+        layout.prop(self, "quantize")
+        layout.prop(self, "decimals")
+        layout.prop(self, "grid_step")
+        layout.prop(self, "use_bake_transforms")
+        layout.prop(self, "use_merge_shapes")
+        layout.prop(self, "use_material_split")
+        layout.prop(self, "use_ngons")
+        layout.prop(self, "use_cleanup")
+        layout.prop(self, "use_incremental")
+        layout.prop(self, "use_tess_cache")
+        layout.prop(self, "cache_dir")
+        layout.prop(self, "cache_size")
+        layout.prop(self, "workers")
+        layout.prop(self, "use_modal")
+        layout.prop(self, "use_profile")
+        layout.prop(self, "profile_output")
 
 # 
 # ================================================================================================================================
@@ -0,0 +1,311 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+import argparse
+import concurrent.futures
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# バッチエクスポート（コマンドライン）
+# ================================================================================================================================
+# マニフェストに列挙した .blend ファイルを Blender のバックグラウンド実行（blender -b）でまとめてエクスポートします。
+# 複数の Blender プロセスを並行して起動し、ファイル単位の失敗は記録して処理を継続し、結果を JSON で出力します。
+#
+# 使い方:
+#   python io_scene_kicad/batch.py manifest.json --jobs 8 --summary summary.json
+#
+# マニフェスト（JSON）:
+#   {
+#     "options": {"global_scale": 0.3937, "use_worigin_to_center": true},
+#     "files": [
+#       "parts/a.blend",
+#       {"blend": "parts/b.blend", "output": "out/b.wrl", "options": {"color_mag": 1.0}}
+#     ]
+#   }
+#   ※オプション名はエクスポートオペレーター（ExportWRL）のプロパティ名と同じ
+#   ※相対パスはマニフェストのフォルダを基準とする。.txt のときは1行1ファイルの .blend パス
+#
+# ※このモジュールは起動側（Blender 外の Python でもよい）では bpy を import しない。
+#   Blender 内のワーカーとして起動されたときだけアドオンを読み込む。
+#
+
+# パッケージのフォルダ（翻訳テキストの読み込みと、ワーカーでのアドオン読み込みに使う）
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# 翻訳テキストのモジュール（起動側の main() で読み込む）
+localeui = None
+
+# 結果の形式バージョン
+SUMMARY_VERSION = 1
+# ワーカーとして起動するときの引数
+WORKER_ARG = "--worker"
+# ワーカーのスクリプトが例外で終了したときの Blender の終了コード（--python-exit-code）
+WORKER_ERROR_EXIT = 1
+
+# Blender が異常終了したか否か（シグナルによる終了、または、Windows の例外による終了）
+# ※ワーカー自身のエラー終了（WORKER_ERROR_EXIT）は、やり直しても同じ結果になるので含めない
+# ================================================================================================================================
+def crashed(returncode):
+    return (returncode < 0) or (returncode >= 0xC0000000)
+
+# スクリプト引数の取得（Blender から起動されたときは "--" 以降）
+# ================================================================================================================================
+def script_args():
+    if "--" in sys.argv:
+        return sys.argv[sys.argv.index("--") + 1:]
+    return sys.argv[1:]
+
+# 既定の Blender 実行ファイル
+# ================================================================================================================================
+def default_blender():
+    # 環境変数の指定を優先
+    if "BLENDER" in os.environ:
+        return os.environ["BLENDER"]
+    # Blender 内で実行されているときは同じ実行ファイル
+    try:
+        import bpy
+        return bpy.app.binary_path
+    except ImportError:
+        return "blender"
+
+# オプション指定（名前=値）の解析。値は JSON として解釈し、できないときは文字列とする
+# ================================================================================================================================
+def parse_option(text):
+    name, sep, value = text.partition("=")
+    if len(sep) == 0:
+        raise argparse.ArgumentTypeError(text)
+    try:
+        return (name.strip(), json.loads(value))
+    except ValueError:
+        return (name.strip(), value)
+
+# マニフェストの読み込み
+# 戻り値: ジョブのリスト（各要素は index, blend, output, options の辞書）
+# ================================================================================================================================
+def load_manifest(path, output_dir=None, overrides=None):
+    basedir = os.path.dirname(os.path.abspath(path))
+    # テキストのときは1行1ファイル
+    if path.endswith(".txt"):
+        with open(path, 'r', encoding='utf-8') as file:
+            manifest = {"files": [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]}
+    else:
+        with open(path, 'r', encoding='utf-8') as file:
+            manifest = json.load(file)
+        # リストのみのとき
+        if isinstance(manifest, list):
+            manifest = {"files": manifest}
+    options = dict(manifest.get("options", {}))
+    options.update(overrides or {})
+
+    jobs = []
+    for entry in manifest.get("files", []):
+        if isinstance(entry, str):
+            entry = {"blend": entry}
+        blend = os.path.join(basedir, entry["blend"])
+        # 出力先（省略時は .blend と同じ名前の .wrl）
+        output = entry.get("output")
+        if output is None:
+            output = os.path.splitext(os.path.basename(blend))[0] + ".wrl"
+            output = os.path.join(output_dir if not output_dir is None else os.path.dirname(blend), output)
+        else:
+            output = os.path.join(output_dir if not output_dir is None else basedir, output)
+        job_options = dict(options)
+        job_options.update(entry.get("options", {}))
+        jobs.append({"index": len(jobs), "blend": os.path.normpath(blend), "output": os.path.normpath(output), "options": job_options})
+    return jobs
+
+# Blender プロセス1つ分のジョブを実行（起動側）
+# 戻り値: ジョブ毎の結果のリスト
+# ================================================================================================================================
+def run_worker(blender, jobs, timeout=None):
+    with tempfile.TemporaryDirectory(prefix="io_scene_kicad_") as tmpdir:
+        job_path = os.path.join(tmpdir, "jobs.json")
+        result_path = os.path.join(tmpdir, "results.jsonl")
+        with open(job_path, 'w', encoding='utf-8') as file:
+            json.dump(jobs, file)
+        command = [blender, "-b", "--factory-startup", "--python-exit-code", str(WORKER_ERROR_EXIT),
+                   "--python", os.path.abspath(__file__), "--", WORKER_ARG, job_path, result_path]
+        returncode = None
+        log = ""
+        # Blender を起動できたか否か（起動できないときはやり直さない）
+        started = True
+        try:
+            proc = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                  timeout=timeout, encoding='utf-8', errors='replace')
+            returncode = proc.returncode
+            log = proc.stdout
+        except subprocess.TimeoutExpired as e:
+            log = e.stdout if isinstance(e.stdout, str) else (e.stdout or b"").decode('utf-8', 'replace')
+            log += "\n" + localeui.gtext("BatchTimeout", "制限時間（%g 秒）を超えたため中断しました。") % timeout
+        except OSError as e:
+            log = str(e)
+            started = False
+
+        # ワーカーが記録した結果（1行1ジョブ）
+        results = {}
+        if os.path.exists(result_path):
+            with open(result_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        result = json.loads(line)
+                    except ValueError:
+                        continue
+                    results[result["index"]] = result
+
+    # 異常終了・制限時間超過のときは、結果のないジョブのうち先頭を処理中のものとして失敗にし、残りをやり直す
+    # それ以外（起動できない・ワーカー自身のエラー終了）のときは、結果のないジョブを全て失敗にする
+    retry = started and ((returncode is None) or crashed(returncode))
+    tail = "\n".join(log.splitlines()[-20:])
+    ret = []
+    rest = []
+    for job in jobs:
+        result = results.get(job["index"])
+        if not result is None:
+            ret.append(result)
+        elif (len(rest) == 0) or (not retry):
+            rest.append(job)
+            ret.append({
+                "index": job["index"],
+                "blend": job["blend"],
+                "output": job["output"],
+                "status": "error",
+                "error": localeui.gtext("BatchWorkerExit", "Blender が終了コード %s で終了しました。") % returncode if started else log,
+                "log": tail,
+                "elapsed": 0.0,
+            })
+        else:
+            rest.append(job)
+    # 残りのジョブは新しい Blender プロセスでやり直す
+    if retry and (len(rest) > 1):
+        ret.extend(run_worker(blender, rest[1:], timeout))
+    return ret
+
+# ワーカー（Blender 内で実行）
+# ================================================================================================================================
+def worker_main(job_path, result_path):
+    import bpy
+    # アドオンを読み込んでオペレーターを登録
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+    addon = __import__(os.path.basename(PACKAGE_DIR))
+    if not hasattr(bpy.types, "EXPORT_SCENE_OT_wrl"):
+        addon.register()
+
+    with open(job_path, 'r', encoding='utf-8') as file:
+        jobs = json.load(file)
+    with open(result_path, 'a', encoding='utf-8') as out:
+        for job in jobs:
+            start = time.perf_counter()
+            result = {"index": job["index"], "blend": job["blend"], "output": job["output"], "status": "ok"}
+            try:
+                bpy.ops.wm.open_mainfile(filepath=job["blend"], load_ui=False)
+                outdir = os.path.dirname(job["output"])
+                if len(outdir) > 0:
+                    os.makedirs(outdir, exist_ok=True)
+                # ※オプションはオペレーターが検証する（不明な名前・型の誤りは例外）
+                ret = bpy.ops.export_scene.wrl(filepath=job["output"], **job["options"])
+                if not 'FINISHED' in ret:
+                    result["status"] = "error"
+                    result["error"] = ",".join(sorted(ret))
+            except Exception as e:
+                result["status"] = "error"
+                result["error"] = "%s: %s" % (type(e).__name__, e)
+            result["elapsed"] = time.perf_counter() - start
+            # 異常終了しても完了分が残るよう1件ずつ書き込む
+            out.write(json.dumps(result) + "\n")
+            out.flush()
+
+# 起動側のメイン
+# ================================================================================================================================
+def main(argv):
+    # 翻訳テキストのモジュールを読み込む（ワーカーでは読み込まない）
+    # ※単独で起動したときは、パッケージのフォルダを検索パスの末尾に加える（同じ名前の他のモジュールを隠さない）
+    global localeui
+    if __package__:
+        from . import localeui
+    else:
+        if not PACKAGE_DIR in sys.path:
+            sys.path.append(PACKAGE_DIR)
+        import localeui
+
+    parser = argparse.ArgumentParser(
+        prog="batch.py",
+        description=localeui.gtext("BatchDescription", ".blend ファイルを一括して KiCad 用の WRL ファイルにエクスポートします"))
+    parser.add_argument("manifest",
+        help=localeui.gtext("BatchManifest", "マニフェスト（.json または1行1ファイルの .txt）"))
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+        help=localeui.gtext("BatchJobs", "並行して起動する Blender の数（既定: CPU 数）"))
+    parser.add_argument("--files-per-process", type=int, default=16,
+        help=localeui.gtext("BatchFilesPerProcess", "Blender プロセス1つで処理するファイル数（起動時間を抑える）"))
+    parser.add_argument("--blender", default=default_blender(),
+        help=localeui.gtext("BatchBlender", "Blender の実行ファイル（既定: 環境変数 BLENDER または blender）"))
+    parser.add_argument("-o", "--output-dir", default=None,
+        help=localeui.gtext("BatchOutputDir", "出力先フォルダ（省略時は .blend と同じフォルダ）"))
+    parser.add_argument("-D", "--option", action="append", type=parse_option, default=[], metavar="NAME=VALUE",
+        help=localeui.gtext("BatchOption", "エクスポートオプションの指定（マニフェストの options より優先）"))
+    parser.add_argument("--summary", default=None,
+        help=localeui.gtext("BatchSummary", "結果を JSON で出力するファイル（省略時は標準出力）"))
+    parser.add_argument("--timeout", type=float, default=None,
+        help=localeui.gtext("BatchTimeoutArg", "Blender プロセス1つあたりの制限時間（秒）"))
+    args = parser.parse_args(argv)
+
+    jobs = load_manifest(args.manifest, args.output_dir, dict(args.option))
+    size = max(1, args.files_per_process)
+    chunks = [jobs[i:i + size] for i in range(0, len(jobs), size)]
+
+    start = time.perf_counter()
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(run_worker, args.blender, chunk, args.timeout) for chunk in chunks]
+        for future in concurrent.futures.as_completed(futures):
+            for result in future.result():
+                results.append(result)
+                print("[%d/%d] %s %s (%.2fs)" % (len(results), len(jobs), result["status"], result["blend"], result["elapsed"]), flush=True)
+                if result["status"] != "ok":
+                    print("    " + result["error"], flush=True)
+    # マニフェストの順序で出力
+    results.sort(key=lambda r: r["index"])
+
+    failed = len([r for r in results if r["status"] != "ok"])
+    summary = {
+        "version": SUMMARY_VERSION,
+        "total": len(results),
+        "succeeded": len(results) - failed,
+        "failed": failed,
+        "elapsed": time.perf_counter() - start,
+        "files": results,
+    }
+    if args.summary is None:
+        print(json.dumps(summary, indent=1))
+    else:
+        with open(args.summary, 'w', encoding='utf-8') as file:
+            json.dump(summary, file, indent=1)
+    # 失敗があったときは終了コード 1
+    return 0 if failed == 0 else 1
+
+# ================================================================================================================================
+if __name__ == "__main__":
+    args = script_args()
+    if (len(args) == 3) and (args[0] == WORKER_ARG):
+        worker_main(args[1], args[2])
+    else:
+        sys.exit(main(args))
@@ -23,6 +23,8 @@ import mathutils
 import os
 import re
 from typing import TypeVar, Sequence
+# ファイルライターと識別子の変換は bpy に依存しないバックエンドへ移動（従来の参照名で公開）
+from .vrml import VrmlWriter, format_rows, zen2hex, vrmlid, materialid
 T = TypeVar('T')
 
 DEBUG = False
@@ -95,42 +97,6 @@ def zoom_color(base_color, zoom_color, color_mag, under=0.01, caption=""):
     # 計算後のカラーを返す
     return tuple(ret_color)
 
-# ファイルライター
-# 出力内容の括弧類に合わせてインデントを自動生成します。
-# ================================================================================================================================
-class FW:
-
-    lastch = ""
-
-    def __init__(self, file):
-        # インデント初期レベル
-        self.indent = 0
-        # ファイル設定
-        self.file = file
-
-    # ファイル出力
-    # data: 出力文字列
-    # ofs: 一時的に加算するインデントレベル
-    def print(self, data="", ofs=0):
-        # アンインデント判定
-        if re.search(r"[\]})]+", data):
-            self.indent -= 1
-        # インデント文字列生成
-        prefix = (self.indent + ofs) * "\t"
-        output = (prefix if self.lastch == '\n' else '') + data
-        # 出力
-        self.file.write(output)
-        self.lastch = output[-1:]
-        # インデント判定
-        if re.search(r"[\[{(]+", data):
-            self.indent += 1
-
-    # 改行付ファイル出力
-    # data: 出力文字列
-    # ofs: 一時的に加算するインデントレベル
-    def println(self, data="", ofs=0):
-        self.print(data + "\n", ofs=ofs)
-
 # 反復子操作
 # ================================================================================================================================
 # 主に、反復を伴うリストの終端を判定するために使う
@@ -160,6 +126,52 @@ class ItOp:
     def last_get(self, last=",", empty=""):
         return last if self.count > 0 else empty
 
+# 挿入順を保持するインデックス付き集合
+# ================================================================================================================================
+# リストと同じ順序で反復でき、要素の有無判定は辞書により O(1) で行う。
+#
+class IndexedSet:
+    # コンストラクタ
+    # ----------------------------------------------------------------
+    def __init__(self, items=()):
+        # 要素 -> 挿入位置の辞書
+        self.positions = {}
+        # 挿入順の要素リスト
+        self.items = []
+        self.update(items)
+
+    # 要素の追加（追加したときTrue）
+    # ----------------------------------------------------------------
+    def add(self, item):
+        if item in self.positions:
+            return False
+        self.positions[item] = len(self.items)
+        self.items.append(item)
+        return True
+
+    # 複数要素の追加
+    # ----------------------------------------------------------------
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    # 要素の挿入位置取得
+    # ----------------------------------------------------------------
+    def index(self, item):
+        return self.positions[item]
+
+    def __contains__(self, item):
+        return item in self.positions
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
 # オブジェクトモードの切り替え
 # ================================================================================================================================
 class ObjectModeApply:
@@ -231,7 +243,8 @@ def get_subpath(filepath, subname):
     # ベース名の取得
     basename = os.path.basename(filepath)
     # 拡張子の抽出
-    mcx = re.search(r"([.][^.]+)$", basename)
+    # ※圧縮ファイル（.wrl.gz）は2重の拡張子をまとめて扱う
+    mcx = re.search(r"([.]wrl[.]gz|[.][^.]+)$", basename, re.IGNORECASE)
     fext = mcx.group(1) if mcx else ""
     # ファイルタイトルの抽出
     ftitle = basename[0:len(basename) - len(fext)].strip('_')
@@ -240,33 +253,6 @@ def get_subpath(filepath, subname):
     # パスを組み立てて返す
     return os.path.join(dirname, fname)
 
-# 日本語を含む文字列を半角英数字に置換
-# ================================================================================================================================
-def zen2hex(str):
-    sv = []
-    for x in range(len(str)):
-        ch = str[x]
-        cd = ord(ch)
-        if (cd >= 0) and (cd <= 255):
-            sv.append(ch)
-        else:
-            sv.append(hex(cd)[2:].upper())
-    return "".join(sv)
-
-# VRML用のオブジェクトID取得
-# ================================================================================================================================
-def vrmlid(n, zen=False):
-    if zen:
-        return '_' + zen2hex(n).replace ('.', '_').replace (' ','_')
-    return '_' + str(n).replace ('.', '_').replace (' ','_')
-
-# VRML用のマテリアル名取得
-# ================================================================================================================================
-def materialid(n, zen=False):
-    if zen:
-        return zen2hex(n).replace ('.', '_').replace (' ','-')
-    return str(n).replace ('.', '_').replace (' ','-')
-
 # 正規表現のfor文対応（search版）
 # ================================================================================================================================
 def re_search(pattern, value):
@@ -20,38 +20,190 @@
 # ================================================================================================================================
 import bpy
 import bpy_extras
-import bmesh
+import collections
+import concurrent.futures
+import hashlib
+import json
 import mathutils
+import numpy as np
 import os
 import re
 from bpy_extras import object_utils
 from . import localeui
 from . import bautils
+from . import tesscache
+from . import sceneir
+from . import vrml
+from . import profiler
+from . import meshops
 
 # DEBUG = False
 DEBUG = True
 
+# 結果がメッシュのローカル座標と設定値のみで決まるモディファイア（同一メッシュで共有可能）
+SHAREABLE_MODIFIERS = {
+    'ARRAY', 'BEVEL', 'DECIMATE', 'EDGE_SPLIT', 'MIRROR', 'REMESH', 'SCREW', 'SOLIDIFY',
+    'SUBSURF', 'TRIANGULATE', 'WELD', 'WIREFRAME', 'SMOOTH', 'WEIGHTED_NORMAL',
+}
+# モディファイアの署名に含めないプロパティ（表示・UI の状態、ジオメトリに影響しない実行時の状態）
+SIGNATURE_SKIP_PROPERTIES = {
+    'rna_type', 'name', 'show_expanded', 'show_on_cage', 'show_in_editmode', 'show_render',
+    'is_active', 'is_override_data_editable', 'use_pin_to_last', 'persistent_uid', 'execution_time',
+}
+# モディファイアの署名で辿る入れ子の構造体の深さの上限（超えるときは共有しない）
+SIGNATURE_DEPTH = 4
+# 重複排除で同一とみなす頂点座標の量子化単位（ゼロスナップの閾値と同じ）
+DEDUP_QUANTUM = 0.00001
+# 差分エクスポート用マニフェストの拡張子（出力ファイルパスに付加）と形式バージョン
+MANIFEST_EXT = ".manifest.json"
+MANIFEST_VERSION = 2
+# 書き出し中の一時ファイルの拡張子（出力ファイルパスに付加し、書き出しを完了したら置き換える）
+PARTIAL_EXT = ".part"
+# 計測結果の拡張子（出力ファイルパスに付加）。JSON と Chrome トレース形式
+PROFILE_EXT = ".profile.json"
+TRACE_EXT = ".trace.json"
+# テッセレーションキャッシュの形式バージョン（整形内容・出力位置のインデントを変えたときは更新する）
+TESS_CACHE_VERSION = 3
+# テッセレーションキャッシュのキーに含める属性の取得方法（データ型 -> (属性名, 要素数, 型)）
+CACHE_ATTRIBUTE_FIELDS = {
+    'FLOAT': ("value", 1, np.float32),
+    'INT': ("value", 1, np.int32),
+    'INT8': ("value", 1, np.int32),
+    'BOOLEAN': ("value", 1, bool),
+    'FLOAT2': ("vector", 2, np.float32),
+    'FLOAT_VECTOR': ("vector", 3, np.float32),
+    'FLOAT_COLOR': ("color", 4, np.float32),
+    'BYTE_COLOR': ("color", 4, np.float32),
+}
+
+# 出力ファイル単位の状態
+# ================================================================================================================================
+# DEF 名、ジオメトリ・Appearance の共有状態と抽出結果（中間表現）をファイル毎に保持します。
+# 原点別の複数ファイルを並行して出力できるよう、MeshExporter 本体には持たせません。
+#
+class FileState:
+
+    # ------------------------------------------------------------------------------------------------
+    def __init__(self, local_origin):
+        # 平行移動量
+        self.local_origin = local_origin
+        # ファイル内の DEF 名
+        self.def_names = set()
+        # オブジェクト -> ジオメトリのキー
+        self.geometry_keys = {}
+        # ジオメトリのキー -> 共有するオブジェクト数
+        self.geometry_counts = {}
+        # ジオメトリのキー -> (DEF 名, 平行移動量)
+        self.geometry_defs = {}
+        # ジオメトリのハッシュ値 -> (DEF 名, 正規化の原点)
+        self.digest_defs = {}
+        # Appearance のキー -> 使用するオブジェクト数
+        self.appearance_counts = {}
+        # Appearance のキー -> DEF 名
+        self.appearance_defs = {}
+        # 出力するシーン（中間表現）
+        self.scene = sceneir.SceneIR()
+
+    # ファイル内で一意な DEF 名を取得
+    # ------------------------------------------------------------------------------------------------
+    def unique_def_name(self, name):
+        # VRML の識別子に使えない文字（制御文字を含む）は置換する
+        base = re.sub(r"[\x00-\x1f\x7f\"#',\[\\\]{}]", "_", bautils.vrmlid(name, zen=True))
+        def_name = base
+        count = 0
+        while def_name in self.def_names:
+            count += 1
+            def_name = "%s_%d" % (base, count)
+        self.def_names.add(def_name)
+        return def_name
+
 # ================================================================================================================================
 class MeshExporter:
 
     global_matrix: None
     global_scale: None
     local_matrix: None
-    local_origin: None
     use_selection: False
     use_worigin_to_center: False
     use_mesh_modifiers: True
     fetch_children: False
     color_mag: 1.5000
+    use_compact: False
+    use_instancing: True
+    use_dedup_geometry: False
+    # モディファイア評価用の依存グラフ
+    depsgraph: None
+    # Appearance のキー -> マテリアルの記録（エクスポート全体で共有）
+    material_cache: dict
+    # ワールドのライト設定の ao_factor
+    ao_factor: None
+    # テッセレーションキャッシュ（無効時は None）
+    tess_cache: None
+    # 差分エクスポート（変更のあった原点別ファイルのみ出力）
+    use_incremental: False
+    # 原点別ファイルを書き出すワーカー数（0 のときは CPU 数）
+    workers: 0
+    # gzip 圧縮（圧縮レベル、圧縮しないときは None）
+    compress_level: None
+    # 頂点座標の量子化の格子間隔と出力桁数（量子化しないときは None）
+    quantize_step: None
+    decimals: None
+    # 平面かつ凸の多角形を三角形分割せずに出力
+    use_ngons: False
+    # マテリアル毎に Shape を分割して出力
+    use_material_split: True
+    # トランスフォームを頂点座標に適用して出力（Transform ノードを出力しない）
+    use_bake_transforms: False
+    # 同じ Appearance のシェイプを統合（トランスフォームの適用が前提）
+    use_merge_shapes: False
+    # 統合前後のノード数（統合しないときは None）
+    merge_stats: None
+    # 頂点座標・インデックスを整形・出力する行数（0 のときは一括）
+    chunk_size: 0
+    # メッシュのクリーンアップで削除した数（クリーンアップしないときは None）
+    cleanup_stats: None
+    # 計測（計測しないときは profiler.NULL）
+    prof: profiler.NullProfiler
+    # 進捗（対象オブジェクト数 total、抽出済みのオブジェクト数 objects と三角形数 triangles）
+    progress: dict
     # 単独シンボル生成時のコレクション（ワールド原点が中心）
-    target_objs: list
+    target_objs: bautils.IndexedSet
     # 原点別のコレクション
     origin_objs: dict
-    fw: bautils.FW
 
     # ------------------------------------------------------------------------------------------------
     def __init__(self):
-        pass
+        # 設定値の初期値
+        self.global_matrix = None
+        self.global_scale = None
+        self.local_matrix = None
+        self.use_selection = False
+        self.use_worigin_to_center = False
+        self.use_mesh_modifiers = True
+        self.fetch_children = False
+        self.color_mag = 1.5000
+        self.use_compact = False
+        self.use_instancing = True
+        self.use_dedup_geometry = False
+        self.use_incremental = False
+        self.workers = 0
+        self.compress_level = None
+        self.quantize_step = None
+        self.decimals = None
+        self.use_ngons = False
+        self.use_material_split = True
+        self.use_bake_transforms = False
+        self.use_merge_shapes = False
+        self.merge_stats = None
+        self.chunk_size = 0
+        self.cleanup_stats = None
+        self.depsgraph = None
+        self.prof = profiler.NULL
+        self.progress = {"total": 0, "objects": 0, "triangles": 0}
+        # マテリアルの算出結果はエクスポート全体で再利用する
+        self.material_cache = {}
+        self.ao_factor = None
+        self.tess_cache = None
 
     # 変換対象のオブジェクトか否かを取得
     # ------------------------------------------------------------------------------------------------
@@ -74,36 +226,75 @@ class MeshExporter:
                 continue
             yield obj
 
+    # 変換対象のオブジェクトか否かを取得（階層インデックスのキャッシュを使用）
+    # ------------------------------------------------------------------------------------------------
+    def is_avail(self, obj):
+        avail = self.avail_map.get(obj)
+        if avail is None:
+            avail = self.avail_obj(obj)
+            self.avail_map[obj] = avail
+        return avail
+
+    # 階層インデックスの作成
+    # 各オブジェクトの最上位の親、最上位の親の位置、収集対象の子オブジェクトを一度の走査で求める
+    # ------------------------------------------------------------------------------------------------
+    def hierarchy_index(self, objects):
+        # オブジェクト -> 変換対象か否か
+        self.avail_map = {}
+        # オブジェクト -> 最上位の親オブジェクト
+        self.root_map = {}
+        # 最上位の親オブジェクト -> 位置情報
+        self.root_locs = {}
+        # 親オブジェクト -> 収集対象の子オブジェクトのリスト
+        self.children_map = {}
+
+        for obj in objects:
+            # 探索済みの祖先に到達するまで親をたどる
+            path = []
+            target = obj
+            while (not target in self.root_map) and (not target.parent is None):
+                path.append(target)
+                target = target.parent
+            # 最上位の親が未登録のとき
+            if not target in self.root_map:
+                self.root_map[target] = target
+                loc, rot, scale = target.matrix_world.decompose()
+                self.root_locs[target] = mathutils.Vector(loc)
+            # たどった経路上のオブジェクトに最上位の親を設定
+            root = self.root_map[target]
+            for item in path:
+                self.root_map[item] = root
+
+        # 子オブジェクトを対象とするとき
+        if self.fetch_children:
+            # ※obj.children は呼び出し毎に全オブジェクトを走査するため、親の参照から逆引きで作成する
+            # ※bpy.data.objects の順序は obj.children の順序と同じ
+            for child in bpy.data.objects:
+                if (not child.parent is None) and self.is_avail(child):
+                    self.children_map.setdefault(child.parent, []).append(child)
+
     # 親オブジェクト取得
     # ------------------------------------------------------------------------------------------------
     def parent_get(self, obj):
-        target = obj
-        while not target.parent is None:
-            target = target.parent
-        loc, rot, scale = target.matrix_world.decompose()
+        target = self.root_map[obj]
         # 親オブジェクト, objが誰かの子かどうか, 位置情報
-        return (target, True if target != obj else False, mathutils.Vector(loc))
+        return (target, True if target != obj else False, self.root_locs[target])
 
     # オブジェクトの子オブジェクトを収集
     # ------------------------------------------------------------------------------------------------
     def children_get(self, obj):
-        collect = []
         # 子オブジェクトを対象とするとき
         # ※子オブジェクトを選択時はcontext.selected_objectsに含まれるのでここではチェックしない
         if self.fetch_children:
-            for child in obj.children:#_recursive:
-                # 収集対象オブジェクトのとき
-                if self.avail_obj(child):
-                    # リストに追加
-                    collect.append(child)
-        # 収集したリストを返す
-        return collect
-    
-# メッシュへのマトリクス適用
-    # ------------------------------------------------------------------------------------------------
-    def bmesh_locRotScale(self, bm, obj):
+            # 階層インデックスから収集対象の子オブジェクトを返す
+            return self.children_map.get(obj, [])
+        return []
+
+    # メッシュへのマトリクス適用
+    # ------------------------------------------------------------------------------------------------
+    def save_locRotScale(self, state, obj, rec):
         # glb_mat = obj.matrix_world  # 表示はOK.位置とスケールがNG
-        mtx = self.local_origin @ obj.matrix_world @ self.local_matrix
+        mtx = state.local_origin @ obj.matrix_world @ self.local_matrix
         # マトリクスから位置・回転・スケールを取得
         loc, rot, sca = mtx.decompose()
         assert(type(loc) is mathutils.Vector)
@@ -115,301 +306,852 @@ class MeshExporter:
         locs = bautils.from_tuples(loc)
         rots = bautils.from_tuples(rot)
         scas = bautils.from_tuples(sca)
-        for loc in locs:
-            self.fw.println("translation %g %g %g" % loc)
-        for rot in rots:
-            self.fw.println("rotation %g %g %g %g" % rot)
-        for sca in scas:
-            self.fw.println("scale %g %g %g" % sca)
-        # self.fw.println("bboxCenter %g %g %g" % from_tuple(self.local_origin))
-        # VRML上でトランスフォームするのでBMeshのトランスフォームは不要。
-        ## bm.transform(glb_mat)
+        rec.translation.extend(locs)
+        rec.rotation.extend(rots)
+        rec.scale.extend(scas)
+        # VRML上でトランスフォームするので頂点座標のトランスフォームは不要。
 
-    # Materialの保存
+    # 頂点座標に適用する変換マトリクスを取得（トランスフォームを頂点座標に適用するとき）
+    # 移動量は save_locRotScale と同じ位置になるよう求め、回転・スケール（せん断を含む）は分解せずにそのまま使う
     # ------------------------------------------------------------------------------------------------
-    def save_materials(self, obj, materials):
+    def bake_matrix(self, state, obj):
+        mtx = state.local_origin @ obj.matrix_world @ self.local_matrix
+        loc, rot, sca = mtx.decompose()
+        # VRMLでは移動量にスケールする必要あり
+        loc *= sca
+        matrix = np.array(mtx, dtype=np.float64)
+        matrix[:3, 3] = tuple(loc)
+        return matrix
 
-        # ※マテリアル定義が無くてもmaterial記述を生成しないとKiCadはモデルを表示しない。
-        self.fw.println('appearance Appearance {')
-        self.fw.println('material Material {')
-        # マテリアル定義があるとき
-        if len(materials) > 0:
-            # ライト設定があるとき
-            if not bpy.data.worlds[0].light_settings is None:
-                # ライト設定のao_factorを取得
-                ao_factor = bpy.data.worlds[0].light_settings.ao_factor
-            # ライト設定がないとき
-            else:
-                # α値は1固定
-                ao_factor = 1.0
-
-            # 最初のマテリアルのみエクスポート（サブメッシュ毎に1つのマテリアルに制限）
-            maters = bautils.ItOp(materials)
-            for m in maters.loop(lambda o: not o is None):
-                base_color = (1, 1, 1)  # White
-                alpha_value = 1
-                # ノードを使用するとき
-                if m.use_nodes:
-                    # ノードからα値を取得（プリンシパルBSDFのアルファ値取得）
-                    base_color, alpha_value = bautils.get_material_base_color(m)
-
-                # マテリアル名(※日本語名は KiCad が認識しない)
-                self.fw.println('# Material %r, %s' % (bautils.materialid(m.name), bautils.vrmlid(m.name)))
-                # 拡散反射色
-                self.fw.println("diffuseColor %.3g %.3g %.3g" % bautils.zoom_color(base_color, m.diffuse_color, self.color_mag, caption=" diffuse"))
-                # 光源反射色
-                self.fw.println("emissiveColor %.3g %.3g %.3g" % bautils.zoom_color(base_color, [0.3, 0.3, 0.3], self.color_mag, caption="emissive"))
-                # 鏡面反射色
-                self.fw.println("specularColor %.3g %.3g %.3g" % bautils.zoom_color(base_color, m.specular_color, self.color_mag, caption="specular"))
-                # 環境光反射率
-                self.fw.println("ambientIntensity %.3g" % ao_factor)
-                # 透過率
-                self.fw.println("transparency %.3g" % (1 - alpha_value))
-                # 鏡面反射率
-                self.fw.println("shininess %.3g" % m.specular_intensity)
-                # 1つのマテリアル生成後終了
-                break
+    # オブジェクトのマテリアルスロット毎のマテリアルを取得
+    # ※スロットのリンク先がオブジェクトのときはオブジェクトのマテリアルになる（メッシュデータのマテリアルではない）
+    # ------------------------------------------------------------------------------------------------
+    def slot_materials(self, obj):
+        return [slot.material for slot in obj.material_slots]
+
+    # 出力するマテリアル（最初の有効なマテリアル）を取得
+    # ------------------------------------------------------------------------------------------------
+    def first_material(self, materials):
+        # 最初のマテリアルのみエクスポート（サブメッシュ毎に1つのマテリアルに制限）
+        for m in materials:
+            if not m is None:
+                return m
+        return None
+
+    # Appearance を識別するキーを取得
+    # ------------------------------------------------------------------------------------------------
+    def appearance_key(self, materials):
+        return (self.first_material(materials), self.color_mag)
+
+    # マテリアルの記録を取得
+    # エクスポート中はマテリアル毎に1回だけ算出する
+    # ------------------------------------------------------------------------------------------------
+    def material_record(self, key):
+        if key in self.material_cache:
+            return self.material_cache[key]
+
+        m, color_mag = key
+        # マテリアル定義がないとき
+        if m is None:
+            mat = sceneir.MaterialRecord()
         else:
-            self.fw.println("# No material definition.")
+            # ライト設定のao_factorを取得（エクスポート中に1回だけ）
+            if self.ao_factor is None:
+                # ライト設定があるとき
+                if not bpy.data.worlds[0].light_settings is None:
+                    # ライト設定のao_factorを取得
+                    self.ao_factor = bpy.data.worlds[0].light_settings.ao_factor
+                # ライト設定がないとき
+                else:
+                    # α値は1固定
+                    self.ao_factor = 1.0
+
+            base_color = (1, 1, 1)  # White
+            alpha_value = 1
+            # ノードを使用するとき
+            if m.use_nodes:
+                # ノードからα値を取得（プリンシパルBSDFのアルファ値取得）
+                base_color, alpha_value = bautils.get_material_base_color(m)
+
+            # マテリアル名(※日本語名は KiCad が認識しない)
+            mat = sceneir.MaterialRecord(m.name)
+            # 拡散反射色
+            mat.diffuse = bautils.zoom_color(base_color, m.diffuse_color, color_mag, caption=" diffuse")
+            # 光源反射色
+            mat.emissive = bautils.zoom_color(base_color, [0.3, 0.3, 0.3], color_mag, caption="emissive")
+            # 鏡面反射色
+            mat.specular = bautils.zoom_color(base_color, m.specular_color, color_mag, caption="specular")
+            # 環境光反射率
+            mat.ambient = self.ao_factor
+            # 透過率
+            mat.transparency = 1 - alpha_value
+            # 鏡面反射率
+            mat.shininess = m.specular_intensity
 
-        self.fw.println('}')  # end 'Material'
-        self.fw.println('}')  # end 'Appearance'
+        self.material_cache[key] = mat
+        return mat
 
-    # BMesh の保存
+    # マテリアル毎に分割するときのスロット毎の番号と Appearance のキーを取得
+    # 内容が同じ Appearance のスロットは同じ番号にまとめる。分割しないとき（キーが1種類以下）は None
+    # 戻り値: (スロット毎の番号の配列, 番号順の Appearance のキー)
     # ------------------------------------------------------------------------------------------------
-    def save_bmesh(self,
-            bm,             # 対象のBMesh
-            obj,            # オブジェクト
-            materials       # マテリアル群
-            ):
+    def material_split(self, materials):
+        if not self.use_material_split:
+            return None
+        keys = bautils.IndexedSet((m, self.color_mag) for m in materials)
+        if len(keys) < 2:
+            return None
+        labels = np.array([keys.index((m, self.color_mag)) for m in materials], dtype=np.int32)
+        return (labels, keys)
 
-        self.fw.println("# %r (%s)" % (obj.name, bautils.vrmlid(obj.name)), ofs=1)
-        self.fw.println('Transform {')
+    # Materialの抽出
+    # ------------------------------------------------------------------------------------------------
+    def save_materials(self, state, materials, rec):
+        self.save_appearance(state, self.appearance_key(materials), rec)
+
+    # Appearance の抽出
+    # rec: メッシュ、または、マテリアル毎の部分の記録
+    # ------------------------------------------------------------------------------------------------
+    def save_appearance(self, state, key, rec):
 
-        self.bmesh_locRotScale(bm, obj)
+        # ※参照するときもマテリアルの記録は保持する（シェイプの統合で Appearance を識別する）
+        rec.material = self.material_record(key)
+        # 同じ Appearance を出力済みのとき
+        if key in state.appearance_defs:
+            # 出力済みの Appearance を参照する
+            rec.appearance_use = state.appearance_defs[key]
+            return
 
-        self.fw.println('children [')
-        self.fw.println('Shape {')
+        # ※マテリアル定義が無くてもmaterial記述を生成しないとKiCadはモデルを表示しない。
+        # 複数のオブジェクトで使われる Appearance には DEF 名を付ける
+        if state.appearance_counts.get(key, 0) > 1:
+            m = key[0]
+            rec.appearance_def = state.unique_def_name("mat_" + (m.name if not m is None else "none"))
+            state.appearance_defs[key] = rec.appearance_def
 
-        self.save_materials(obj, materials)
+    # モディファイアの設定から署名を作成
+    # 同じメッシュデータで署名が同じなら、モディファイア適用後のジオメトリも同じになる。
+    # 結果が他のオブジェクトやワールド座標に依存し得るときは None を返す（共有しない）
+    # ------------------------------------------------------------------------------------------------
+    def modifier_signature(self, obj):
+        signature = []
+        for mod in obj.modifiers:
+            # ビューポートで無効なモディファイアは評価されない
+            if not mod.show_viewport:
+                continue
+            # ローカル座標のみで結果が決まるモディファイア以外は共有しない
+            if not mod.type in SHAREABLE_MODIFIERS:
+                return None
+            values = self.rna_signature(mod)
+            if values is None:
+                return None
+            signature.append((mod.type, values))
+        return tuple(signature)
 
-        self.fw.println('geometry IndexedFaceSet {')
-        self.fw.println('coord Coordinate {')
-        self.fw.println('point [')
+    # 構造体のプロパティの値から署名を作成（セッションをまたいで同じ値になる）
+    # 入れ子の構造体（ベベルのカスタムプロファイル等）は内容で、ID はフルネームで表す。
+    # 他のオブジェクトを参照するときは None を返す（共有しない）
+    # ------------------------------------------------------------------------------------------------
+    def rna_signature(self, struct, depth=0):
+        if depth > SIGNATURE_DEPTH:
+            return None
+        values = []
+        for prop in struct.bl_rna.properties:
+            if prop.identifier in SIGNATURE_SKIP_PROPERTIES:
+                continue
+            if prop.type == 'POINTER':
+                value = self.rna_value(getattr(struct, prop.identifier), depth)
+                if value is None:
+                    return None
+            elif prop.type == 'COLLECTION':
+                value = tuple(self.rna_value(item, depth) for item in getattr(struct, prop.identifier))
+                if None in value:
+                    return None
+            # 読み取り専用の値（実行時の状態）は含めない
+            elif prop.is_readonly:
+                continue
+            else:
+                value = getattr(struct, prop.identifier)
+                if getattr(prop, 'is_array', False):
+                    value = tuple(value)
+                elif isinstance(value, set):
+                    value = tuple(sorted(value))
+            values.append((prop.identifier, value))
+        return tuple(values)
 
-        # 座標列の生成
-        v = None
-        # 反復操作オブジェクト生成
-        itverts = bautils.ItOp(bm.verts)    # データ終端判定の指定
-        for v in itverts.loop():
+    # 参照先の署名（未設定は空タプル、共有できないときは None）
+    # ------------------------------------------------------------------------------------------------
+    def rna_value(self, value, depth):
+        if value is None:
+            return ()
+        # 他のオブジェクトを参照するときは相対位置に依存するので共有しない
+        if isinstance(value, bpy.types.Object):
+            return None
+        # ID は名前で表す（メモリ上のアドレスはセッション毎に変わる）
+        if isinstance(value, bpy.types.ID):
+            return ("ID", value.name_full)
+        return self.rna_signature(value, depth + 1)
 
-            # 丸め誤差をゼロにスナップする
-            v.co[0] = 0 if abs(v.co[0]) < 0.00001 else v.co[0]
-            v.co[1] = 0 if abs(v.co[1]) < 0.00001 else v.co[1]
-            v.co[2] = 0 if abs(v.co[2]) < 0.00001 else v.co[2]
+    # ジオメトリの内容のハッシュ値を取得
+    # 頂点座標は境界ボックスの最小点を原点として正規化・量子化するので、平行移動しただけの複製も一致する
+    # sizes: マテリアル毎の部分の面の数（分割しないときは None）
+    # 戻り値: (ハッシュ値, 正規化の原点)
+    # ------------------------------------------------------------------------------------------------
+    def geometry_digest(self, co, tris, polys=None, sizes=None):
+        co = co.astype(np.float64)
+        origin = co.min(axis=0) if len(co) > 0 else np.zeros(3)
+        grid = np.round((co - origin) / DEDUP_QUANTUM).astype(np.int64)
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(np.array(grid.shape + tris.shape, dtype=np.int64).tobytes())
+        digest.update(grid.tobytes())
+        digest.update(tris.astype(np.int32).tobytes())
+        if not polys is None:
+            digest.update(polys.astype(np.int32).tobytes())
+        if not sizes is None:
+            digest.update(np.array(sizes, dtype=np.int64).tobytes())
+        return (digest.digest(), origin)
 
-            self.fw.println("%.6g %.6g %.6g%s" % \
-                (v.co[0], v.co[1], v.co[2], itverts.last_get()))
+    # メッシュデータから結果が決まるか否かを判定し、モディファイアの署名を返す
+    # 戻り値: モディファイアの署名（適用しないときは空）、メッシュデータだけで決まらないときは None
+    # ------------------------------------------------------------------------------------------------
+    def hashable_signature(self, obj):
+        # モディファイアを適用しないとき
+        if not self.use_mesh_modifiers:
+            return ()
+        signature = self.modifier_signature(obj)
+        if signature is None:
+            return None
+        # 頂点グループの重みはハッシュに含められない
+        for mod in obj.modifiers:
+            if mod.show_viewport and getattr(mod, 'vertex_group', ""):
+                return None
+        return signature
+
+    # メッシュデータ（トポロジー・頂点座標・属性）をハッシュに追加
+    # attributes: モディファイアの結果に影響する属性（クリース、ベベルウェイト等）も追加するか否か
+    # 戻り値: ハッシュに含められない属性があるときは False
+    # ------------------------------------------------------------------------------------------------
+    def mesh_digest_update(self, digest, me, attributes=False):
+        # トポロジーと頂点座標
+        for items, attr, width, dtype in (
+                (me.vertices, "co", 3, np.float32),
+                (me.edges, "vertices", 2, np.int32),
+                (me.polygons, "loop_total", 1, np.int32),
+                (me.polygons, "material_index", 1, np.int32),
+                (me.loops, "vertex_index", 1, np.int32)):
+            values = np.empty(len(items) * width, dtype=dtype)
+            items.foreach_get(attr, values)
+            digest.update(values.tobytes())
+        if attributes:
+            for attribute in me.attributes:
+                # 内部属性（選択状態等）は除外
+                if attribute.name.startswith('.'):
+                    continue
+                field = CACHE_ATTRIBUTE_FIELDS.get(attribute.data_type)
+                if field is None:
+                    return False
+                attr, width, dtype = field
+                values = np.empty(len(attribute.data) * width, dtype=dtype)
+                attribute.data.foreach_get(attr, values)
+                digest.update(repr((attribute.name, attribute.domain)).encode())
+                digest.update(values.tobytes())
+        return True
+
+    # シェイプキーの状態（値・ミュート・基準キー・スライダー範囲・頂点座標）をハッシュに追加
+    # ※評価済みのメッシュ（モディファイアを適用するとき）にはシェイプキーが適用される
+    # 戻り値: ハッシュに含められない（頂点グループで重み付けした）シェイプキーがあるときは False
+    # ------------------------------------------------------------------------------------------------
+    def shape_keys_digest_update(self, digest, me):
+        key = me.shape_keys
+        if key is None:
+            return True
+        digest.update(repr((key.use_relative, key.eval_time, key.reference_key.name)).encode())
+        for block in key.key_blocks:
+            # 頂点グループの重みはハッシュに含められない
+            if block.vertex_group:
+                return False
+            digest.update(repr((block.name, block.value, block.mute, block.relative_key.name,
+                                block.slider_min, block.slider_max, block.interpolation)).encode())
+            co = np.empty(len(block.data) * 3, dtype=np.float32)
+            block.data.foreach_get("co", co)
+            digest.update(co.tobytes())
+        return True
+
+    # テッセレーションキャッシュのキーを取得（キャッシュしないときは None）
+    # メッシュデータ、モディファイア、変換マトリクス、ジオメトリの出力に影響する設定から算出する
+    # matrix: 頂点座標に適用する変換マトリクス（適用しないときは None）
+    # ------------------------------------------------------------------------------------------------
+    def tess_cache_key(self, obj, matrix=None):
+        # キャッシュ無効、または、編集モードのときはキャッシュしない
+        # ※シェイプを統合するときは頂点座標の配列が必要なので整形済みのジオメトリは使わない
+        if (self.tess_cache is None) or (obj.mode == 'EDIT') or self.use_merge_shapes:
+            return None
+        signature = self.hashable_signature(obj)
+        if signature is None:
+            return None
+        digest = hashlib.blake2b(digest_size=20)
+        if not self.mesh_digest_update(digest, obj.data, len(signature) > 0):
+            return None
+        if self.use_mesh_modifiers and not self.shape_keys_digest_update(digest, obj.data):
+            return None
+        # モディファイア、変換マトリクス、出力設定
+        digest.update(repr((
+            TESS_CACHE_VERSION,
+            signature,
+            [tuple(row) for row in self.global_matrix],
+            [tuple(row) for row in self.global_scale],
+            self.use_compact,
+            self.use_dedup_geometry,
+            self.quantize_step,
+            self.decimals,
+            not self.cleanup_stats is None,
+            self.use_ngons,
+            None if matrix is None else matrix.tolist(),
+        )).encode())
+        return digest.hexdigest()
+
+    # 出力ファイルの内容を決める設定値
+    # ------------------------------------------------------------------------------------------------
+    def export_options(self):
+        return (
+            [tuple(row) for row in self.global_matrix],
+            [tuple(row) for row in self.global_scale],
+            self.color_mag,
+            self.use_mesh_modifiers,
+            self.use_compact,
+            self.use_instancing,
+            self.use_dedup_geometry,
+            self.compress_level,
+            self.quantize_step,
+            self.decimals,
+            not self.cleanup_stats is None,
+            self.use_ngons,
+            self.use_material_split,
+            self.use_bake_transforms,
+            self.use_merge_shapes,
+        )
+
+    # 出力ファイル毎のハッシュ値を取得（差分エクスポート用）
+    # 出力対象のオブジェクトのメッシュデータ、トランスフォーム、マテリアルと設定値から算出する
+    # ------------------------------------------------------------------------------------------------
+    def group_digest(self, objects, local_origin):
+        digest = hashlib.blake2b(digest_size=20)
+        digest.update(repr((MANIFEST_VERSION, self.export_options(), [tuple(row) for row in local_origin])).encode())
+        for obj in objects:
+            if not (obj.type == 'MESH' and obj.visible_get()):
+                continue
+            digest.update(repr((obj.name, [tuple(row) for row in obj.matrix_world])).encode())
+            # マテリアル（出力内容で比較する）
+            for m in self.slot_materials(obj):
+                digest.update(repr(vrml.material_lines(self.material_record((m, self.color_mag)))).encode())
+            # 編集モードのとき
+            if obj.mode == 'EDIT':
+                # 編集状態をメッシュに反映
+                obj.update_from_editmode()
+            signature = self.hashable_signature(obj)
+            # メッシュデータ（シェイプキーを含む）とモディファイアの設定から結果が決まるとき
+            if (not signature is None) and self.mesh_digest_update(digest, obj.data, len(signature) > 0) \
+                    and ((not self.use_mesh_modifiers) or self.shape_keys_digest_update(digest, obj.data)):
+                digest.update(repr(signature).encode())
+            # 他のオブジェクト等に依存するモディファイアがあるとき
+            else:
+                # 評価済みのメッシュで比較する
+                obj_eval = obj.evaluated_get(self.depsgraph)
+                co, tris, polys, _, _ = self.mesh_arrays(obj_eval.to_mesh())
+                obj_eval.to_mesh_clear()
+                digest.update(co.tobytes())
+                digest.update(tris.tobytes())
+                if not polys is None:
+                    digest.update(polys.tobytes())
+        return digest.hexdigest()
 
-            del v
+    # 差分エクスポート用のマニフェストの読み込み
+    # ------------------------------------------------------------------------------------------------
+    def load_manifest(self, path):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                manifest = json.load(file)
+            if manifest.get("version") == MANIFEST_VERSION:
+                return manifest.get("files", {})
+        except (OSError, ValueError):
+            pass
+        return {}
 
-        self.fw.println(']')  # end 'point'
-        self.fw.println('}')  # end 'Coordinate'
+    # 差分エクスポート用のマニフェストの保存
+    # ------------------------------------------------------------------------------------------------
+    def save_manifest(self, path, files):
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({"version": MANIFEST_VERSION, "files": files}, file, indent=1, sort_keys=True)
 
-        # 座標インデックスの列生成
-        self.fw.println('coordIndex [')
-        f = fv = None
-        itfaces = bautils.ItOp(bm.faces)
-        for f in itfaces.loop():
+    # 同一ジオメトリを判定するためのキーを取得（共有できないときは None）
+    # ------------------------------------------------------------------------------------------------
+    def geometry_key(self, obj):
+        # 共有しない設定、または、編集モードのときは共有しない
+        if (not self.use_instancing) or (obj.mode == 'EDIT'):
+            return None
+        # トランスフォームを頂点座標に適用するときは、オブジェクト毎に座標が異なるので共有しない
+        # ※平行移動のみ異なる複製はジオメトリの重複排除で共有できる
+        if self.use_bake_transforms:
+            return None
+        # マテリアル毎に分割するときは、部分の分け方がスロットのマテリアルで決まるので、マテリアルが同じときのみ共有する
+        materials = self.slot_materials(obj)
+        slots = () if self.material_split(materials) is None else tuple(materials)
+        # モディファイアを適用するとき
+        if self.use_mesh_modifiers:
+            signature = self.modifier_signature(obj)
+            if signature is None:
+                return None
+            return (obj.data, signature, slots)
+        return (obj.data, (), slots)
 
-            fv = f.verts[:]
+    # メッシュから頂点座標と三角形インデックスの配列を一括取得
+    # 多角形のまま出力するときは、平面かつ凸の多角形のインデックス配列（-1 区切り）と残りの面の三角形を返す
+    # materials: 面毎のマテリアル番号も取得するか否か
+    # 戻り値: (頂点座標, 三角形インデックス, 多角形のインデックス配列 or None,
+    #          三角形毎のマテリアル番号 or None, 多角形毎のマテリアル番号 or None)
+    # ------------------------------------------------------------------------------------------------
+    def mesh_arrays(self, me, materials=False):
+        # 三角形分割（ビューポートと同じ分割結果）の算出
+        me.calc_loop_triangles()
+        # 頂点座標の一括取得
+        # ※foreach_get は開始位置を指定できないため配列は一括で取得し、整形・出力のみ分割する（chunk_size）
+        co = np.empty(len(me.vertices) * 3, dtype=np.float32)
+        me.vertices.foreach_get("co", co)
+        # 三角形の頂点インデックスの一括取得
+        tris = np.empty(len(me.loop_triangles) * 3, dtype=np.int32)
+        me.loop_triangles.foreach_get("vertices", tris)
+        co = co.reshape(-1, 3)
+        tris = tris.reshape(-1, 3)
+        # 三角形毎のマテリアル番号の一括取得
+        tri_materials = None
+        if materials:
+            tri_materials = np.empty(len(me.loop_triangles), dtype=np.int32)
+            me.loop_triangles.foreach_get("material_index", tri_materials)
+        if not self.use_ngons:
+            return (co, tris, None, tri_materials, None)
+        # 面のループ（頂点インデックス）の一括取得
+        loop_vertices = np.empty(len(me.loops), dtype=np.int32)
+        me.loops.foreach_get("vertex_index", loop_vertices)
+        loop_start = np.empty(len(me.polygons), dtype=np.int32)
+        me.polygons.foreach_get("loop_start", loop_start)
+        loop_total = np.empty(len(me.polygons), dtype=np.int32)
+        me.polygons.foreach_get("loop_total", loop_total)
+        # 平面かつ凸の多角形はそのまま出力し、それ以外の面（三角形を含む）は三角形分割の結果を使う
+        keep = meshops.flat_convex(co, loop_vertices, loop_start, loop_total)
+        polys = meshops.polygon_stream(loop_vertices, loop_start, loop_total, keep)
+        polygon_index = np.empty(len(me.loop_triangles), dtype=np.int32)
+        me.loop_triangles.foreach_get("polygon_index", polygon_index)
+        # 多角形毎のマテリアル番号（出力する多角形の順）
+        poly_materials = None
+        if materials:
+            tri_materials = tri_materials[~keep[polygon_index]]
+            poly_materials = np.empty(len(me.polygons), dtype=np.int32)
+            me.polygons.foreach_get("material_index", poly_materials)
+            poly_materials = poly_materials[keep]
+        return (co, tris[~keep[polygon_index]], polys, tri_materials, poly_materials)
 
-            self.fw.println("%d, %d, %d, -1%s" % \
-                (fv[0].index, fv[1].index, fv[2].index, itfaces.last_get()))
+    # マテリアル毎の部分に分割
+    # 使われているマテリアルが1つ以下のときは分割せず、そのマテリアルの Appearance を使う
+    # 戻り値: 部分毎の Appearance のキー
+    # ------------------------------------------------------------------------------------------------
+    def split_parts(self, state, obj, rec, split, tri_materials, poly_materials):
+        labels, keys = split
+        # ※スロット数を超えるマテリアル番号は最後のスロットとして扱う
+        last = len(labels) - 1
+        faces = meshops.split_faces(rec.tris, labels[np.minimum(tri_materials, last)], rec.polys,
+                                    None if poly_materials is None else labels[np.minimum(poly_materials, last)])
+        if len(faces) < 2:
+            if len(faces) == 0:
+                key = self.appearance_key(self.slot_materials(obj))
+            else:
+                label, rec.tris, rec.polys = faces[0]
+                key = keys[label]
+            self.save_appearance(state, key, rec)
+            return [key]
+        rec.parts = []
+        for label, tris, polys in faces:
+            part = sceneir.SubMeshRecord()
+            self.save_appearance(state, keys[label], part)
+            part.tris = tris
+            part.polys = polys
+            rec.parts.append(part)
+        rec.tris = rec.polys = None
+        # 頂点座標は部分間で共有する
+        rec.coord_def = state.unique_def_name("co_" + obj.data.name)
+        return [keys[label] for label, _, _ in faces]
 
-            del f, fv
+    # 出力済みのマテリアル毎の部分を参照
+    # parts: 部分毎の (Appearance のキー, ジオメトリの DEF 名) のリスト
+    # ------------------------------------------------------------------------------------------------
+    def use_parts(self, state, rec, parts):
+        if len(parts) == 1:
+            key, rec.geometry_def = parts[0]
+            self.save_appearance(state, key, rec)
+            return
+        rec.parts = []
+        for key, def_name in parts:
+            part = sceneir.SubMeshRecord()
+            self.save_appearance(state, key, part)
+            part.geometry_def = def_name
+            rec.parts.append(part)
 
-        self.fw.println(']')     # end 'coordIndex'
-        self.fw.println('}')     # end 'IndexedFaceSet'
+    # マテリアル毎の部分を含めたジオメトリの内容のハッシュ値を取得
+    # ------------------------------------------------------------------------------------------------
+    def parts_digest(self, rec):
+        tris = np.concatenate([part.tris for part in rec.parts])
+        polys = None
+        if not rec.parts[0].polys is None:
+            polys = np.concatenate([part.polys for part in rec.parts])
+        sizes = [(len(part.tris), 0 if part.polys is None else len(part.polys)) for part in rec.parts]
+        return self.geometry_digest(rec.co, tris, polys, sizes)
 
-        self.fw.println('}')     # end 'Shape'
-        self.fw.println(']')     # end 'children'
-        self.fw.print('}')       # end 'Transform'
-   
+    # ジオメトリの DEF 名を取得（マテリアル毎に分割したときは部分毎の DEF 名のリスト）
+    # ------------------------------------------------------------------------------------------------
+    def geometry_def_name(self, state, obj, rec):
+        if rec.parts is None:
+            return state.unique_def_name(obj.data.name)
+        return [state.unique_def_name(obj.data.name) for part in rec.parts]
 
-    # オブジェクトの保存
+    # オブジェクトの抽出（メインスレッドで実行）
     # ------------------------------------------------------------------------------------------------
-    def save_object(self, obj):
+    def extract_object(self, state, obj):
 
         # ※オブジェクトはメッシュ必須
         assert(obj.type == 'MESH')
 
-        # 選択済みオブジェクトの選択解除
-        sel = bautils.Selector()
-        # 複製オブジェクトのインスタンス兼リリースフラグ
-        rel_obj = None
+        prof = self.prof
+        rec = sceneir.MeshRecord(obj.name)
+        # トランスフォームを頂点座標に適用するとき
+        matrix = None
+        if self.use_bake_transforms:
+            matrix = self.bake_matrix(state, obj)
+        else:
+            self.save_locRotScale(state, obj, rec)
+
+        # マテリアル毎に分割するか否か
+        materials = self.slot_materials(obj)
+        split = self.material_split(materials)
 
+        # 同じメッシュデータのジオメトリを出力済みのとき
+        geometry_key = state.geometry_keys.get(obj)
+        if geometry_key in state.geometry_defs:
+            # 出力済みのジオメトリを参照する
+            def_name, rec.offset = state.geometry_defs[geometry_key]
+            with prof.phase("material"):
+                if split is None:
+                    rec.geometry_def = def_name
+                    self.save_materials(state, materials, rec)
+                else:
+                    # マテリアル毎の部分の Appearance のキーと DEF 名
+                    self.use_parts(state, rec, def_name)
+            return rec
+
+        # テッセレーションキャッシュを検索
+        # ※マテリアル毎に分割するメッシュはキャッシュしない（キャッシュは1つのジオメトリの整形結果のみを保存するため）
+        with prof.phase("cache"):
+            cache_key = self.tess_cache_key(obj, matrix) if split is None else None
+            cached = None if cache_key is None else self.tess_cache.get(cache_key)
+
+        obj_eval = None
+        # キャッシュにあるとき
+        if not cached is None:
+            # 整形済みのジオメトリを使う（メッシュの評価・整形は不要）
+            meta, rec.body = cached
         # モディファイアを適用するとき
-        if self.use_mesh_modifiers:
-            # オブジェクトモードへ移行
-            mode_state = bautils.ObjectModeApply(obj, True)
-            # 対象オブジェクトの選択設定
-            state = sel.set_select(obj)
-            # 変換->メッシュでモディファイヤを適用したオブジェクトを生成する
-            bpy.ops.object.convert(target='MESH', keep_original=True)
-            # モディファイヤ適用後の複製されたメッシュを取得
-            rel_obj = bpy.context.active_object
-            # メッシュ参照
-            me = rel_obj.data
-            # 選択状態復元
-            sel.restore_select(obj, state)
-            # 編集モードの復元
-            mode_state.restore()
+        elif self.use_mesh_modifiers:
+            # 評価済み（モディファイア適用後）のオブジェクトからメッシュを取得
+            # ※オペレーターを使わないので選択・アクティブ・編集モードの状態は変化しない
+            with prof.phase("evaluate"):
+                obj_eval = obj.evaluated_get(self.depsgraph)
+                me = obj_eval.to_mesh()
         else:
+            # 編集モードのとき
+            if obj.mode == 'EDIT':
+                # 編集状態をメッシュに反映
+                obj.update_from_editmode()
             # メッシュ参照
             me = obj.data
 
-        # 編集モードのとき
-        if obj.mode == 'EDIT':
-            # 編集状態のメッシュからBMeshを取得
-            bm_orig = bmesh.from_edit_mesh(me)
-            bm = bm_orig.copy()
+        if cached is None:
+            # 頂点座標と三角形インデックスを一括取得（配列はメッシュから独立したコピー）
+            with prof.phase("triangulate"):
+                rec.co, rec.tris, rec.polys, tri_materials, poly_materials = self.mesh_arrays(me, not split is None)
+            # トランスフォームを頂点座標に適用するとき
+            if not matrix is None:
+                with prof.phase("bake"):
+                    rec.co = meshops.transform(rec.co, matrix)
+                    # 鏡像になる変換のときは面の向きを反転する
+                    if np.linalg.det(matrix[:3, :3]) < 0:
+                        rec.tris, rec.polys = meshops.flip_winding(rec.tris, rec.polys)
+            # 頂点座標を量子化するとき（丸めて同じになった頂点はまとめる）
+            # ※トランスフォームを適用しないときはローカル座標（Transform でスケールされる前の出力値）を丸める。
+            #   格子間隔をオブジェクトのスケールで割ると、インスタンスの共有・キャッシュのキー・出力桁数が合わなくなるため
+            if not self.quantize_step is None:
+                with prof.phase("quantize"):
+                    rec.co, rec.tris, rec.polys, merged = meshops.quantize(rec.co, rec.tris, self.quantize_step, rec.polys)
+                    # 頂点をまとめて潰れた面は、クリーンアップの設定によらず取り除く（同じ頂点を含む面を出力しない）
+                    rec.tris, rec.polys, tri_materials, poly_materials, collapsed = meshops.drop_collapsed(
+                        rec.tris, rec.polys, tri_materials, poly_materials)
+                prof.count("merged_vertices", merged)
+                prof.count("collapsed_faces", collapsed)
+            # 面積ゼロ・重複した三角形と未使用の頂点を取り除くとき
+            if not self.cleanup_stats is None:
+                with prof.phase("cleanup"):
+                    rec.co, rec.tris, rec.polys, tri_materials, removed = meshops.cleanup(rec.co, rec.tris, rec.polys, tri_materials)
+                for name, value in removed.items():
+                    self.cleanup_stats[name] += value
+        # マテリアル毎に分割するとき
+        keys = None
+        if not split is None:
+            with prof.phase("split"):
+                keys = self.split_parts(state, obj, rec, split, tri_materials, poly_materials)
+        if keys is None:
+            # ※評価済みメッシュのマテリアルは依存グラフ上の複製なので、Appearance のキーには元のオブジェクトのマテリアルを使う
+            with prof.phase("material"):
+                self.save_materials(state, materials, rec)
+        def_name = None
+        offset = None
+        # 内容が同じジオメトリを重複排除するとき（シェイプを統合するときは統合するので不要）
+        if self.use_dedup_geometry and not self.use_merge_shapes:
+            if cached is None:
+                with prof.phase("dedup"):
+                    if rec.parts is None:
+                        digest, origin = self.geometry_digest(rec.co, rec.tris, rec.polys)
+                    else:
+                        digest, origin = self.parts_digest(rec)
+            else:
+                digest, origin = bytes.fromhex(meta["digest"]), np.array(meta["origin"])
+            # 内容が同じジオメトリを出力済みのとき
+            if digest in state.digest_defs:
+                # 出力済みのジオメトリを位置の差分だけずらして参照する
+                def_name, def_origin = state.digest_defs[digest]
+                offset = origin - def_origin
+                rec.co = rec.tris = rec.polys = rec.body = None
+                cache_key = None
+            else:
+                # 後続のオブジェクトから参照できるよう DEF 名を付ける
+                def_name = self.geometry_def_name(state, obj, rec)
+                state.digest_defs[digest] = (def_name, origin)
+        # 複数のオブジェクトで共有されるジオメトリには DEF 名を付ける
+        elif state.geometry_counts.get(geometry_key, 0) > 1:
+            def_name = self.geometry_def_name(state, obj, rec)
+        # マテリアル毎の部分には部分毎に DEF 名を付ける
+        if not rec.parts is None:
+            if rec.co is None:
+                rec.coord_def = None
+            for inx, part in enumerate(rec.parts):
+                part.geometry_def = None if def_name is None else def_name[inx]
+                # 出力済みのジオメトリを参照するとき
+                if rec.co is None:
+                    part.tris = part.polys = None
         else:
-            # BMesh を作成
-            bm = bmesh.new()
-            bm.from_mesh(me)
-
-        # 変換前に三角形分割を行う（変換後に行うと失敗する。2.7以前）
-        bmesh.ops.triangulate(bm, faces=bm.faces)
-        # BMeshの保存
-        self.save_bmesh(bm, obj, me.materials)
-        # BMesh インスタンス解放
-        bm.free()
+            rec.geometry_def = def_name
+        # 同じメッシュデータの後続オブジェクトは同じジオメトリを参照する
+        if not geometry_key is None:
+            if keys is None:
+                state.geometry_defs[geometry_key] = (def_name, offset)
+            elif rec.parts is None:
+                state.geometry_defs[geometry_key] = ([(keys[0], def_name)], offset)
+            else:
+                state.geometry_defs[geometry_key] = (list(zip(keys, def_name or [None] * len(keys))), offset)
+        rec.offset = offset
+        # 整形したジオメトリは書き出し時にキャッシュへ保存する
+        if (cached is None) and (not cache_key is None):
+            rec.cache_key = cache_key
+            rec.cache_meta = {}
+            if self.use_dedup_geometry and not self.use_merge_shapes:
+                rec.cache_meta = {"digest": digest.hex(), "origin": origin.tolist()}
 
-        # 複製されたオブジェクトがあるとき
-        if not rel_obj is None:
-            # 複製オブジェクトを選択して削除
-            sel.set_select(rel_obj)
-            bpy.ops.object.delete(use_global=True, confirm=False)
-            rel_obj = None
+        # 評価済みメッシュがあるとき
+        if not obj_eval is None:
+            # 一時メッシュの解放
+            obj_eval.to_mesh_clear()
+        return rec
 
-        # 選択済みオブジェクトの選択復元
-        sel.restore_select_all()
+    # ファイル1つ分のオブジェクトの抽出（メインスレッドで実行）
+    # ------------------------------------------------------------------------------------------------
+    def extract_objects(self, objects, local_origin):
+        return run_steps(self.iter_extract_objects(objects, local_origin))
 
+    # ファイル1つ分のオブジェクトの抽出（オブジェクト毎に進捗を返すジェネレーター。戻り値は FileState）
     # ------------------------------------------------------------------------------------------------
-    def save_objects(self, objects):
+    def iter_extract_objects(self, objects, local_origin):
+
+            state = FileState(local_origin)
+            state.scene.decimals = self.decimals
+            state.scene.chunk_size = self.chunk_size
 
-            # プリミティブ定義開始
-            self.fw.println()
-            self.fw.println("Group {")
-            self.fw.println("children [")
+            # 共有できるジオメトリ、及び、Appearance のキーと共有数を求める
+            for obj in objects:
+                if obj.type == 'MESH' and obj.visible_get():
+                    materials = self.slot_materials(obj)
+                    split = self.material_split(materials)
+                    # マテリアル毎に分割するときは、使われ得る全てのマテリアルを数える
+                    for appearance_key in ([self.appearance_key(materials)] if split is None else split[1]):
+                        state.appearance_counts[appearance_key] = state.appearance_counts.get(appearance_key, 0) + 1
+                    geometry_key = self.geometry_key(obj)
+                    if not geometry_key is None:
+                        state.geometry_keys[obj] = geometry_key
+                        state.geometry_counts[geometry_key] = state.geometry_counts.get(geometry_key, 0) + 1
 
             obj = None
+            records = []
+            extracted = 0
             itobj = bautils.ItOp(objects)
             # メッシュで表示以外はスキップ
             for obj in itobj.loop(lambda o: o.type == 'MESH' and o.visible_get()):
 
-                # オブジェクトの保存
-                self.save_object(obj)
-
-                # end 'Shape'
-                self.fw.println('%s' % (itobj.last_get()))
+                # オブジェクトの抽出
+                with self.prof.phase("extract"):
+                    rec = self.extract_object(state, obj)
+                # シェイプを統合するときは抽出後にまとめて追加する
+                if self.use_merge_shapes:
+                    records.append(rec)
+                else:
+                    state.scene.add(rec)
+                    rec.last = itobj.last_get()
+                # 進捗の更新
+                extracted += 1
+                self.progress["objects"] += 1
+                self.progress["triangles"] += record_triangles(rec)
 
                 del obj
+                yield self.progress
 
-            # プリミティブ定義終了
-            self.fw.println("]")
-            self.fw.println("}")
+            # 出力しない（メッシュ以外・非表示）オブジェクトも処理済みとして数える
+            self.progress["objects"] += len(objects) - extracted
 
-    # ファイルに出力
-    # ------------------------------------------------------------------------------------------------
-    def save_to_file(self, filepath, objects):
-        file = None
-        try:
-            # ファイルを開く
-            file = open(filepath, 'w', encoding='utf-8')
+            # 同じ Appearance のシェイプを統合
+            if self.use_merge_shapes:
+                with self.prof.phase("merge"):
+                    self.merge_shapes(state, records)
 
-            # ファイルライター作成
-            self.fw = bautils.FW(file)
+            return state
 
-            # VRML2 エントリ書込み
-            self.fw.println('#VRML V2.0 utf8')
-            self.fw.println('#modeled using blender3d http://blender.org')
+    # 同じ Appearance のシェイプを統合（トランスフォームは頂点座標に適用済み）
+    # Appearance 毎に頂点座標・インデックスの配列を連結し、Appearance 毎に1つの Shape を出力する
+    # ------------------------------------------------------------------------------------------------
+    def merge_shapes(self, state, records):
+        # マテリアルの記録 -> 連結するジオメトリのリスト（※マテリアルの記録は Appearance 毎に1つ）
+        groups = {}
+        for rec in records:
+            self.merge_stats["before"] += vrml.count_nodes(rec)
+            if rec.parts is None:
+                groups.setdefault(rec.material, []).append((rec.co, rec.tris, rec.polys))
+            else:
+                # マテリアル毎の部分は、部分で使う頂点のみを連結する
+                for part in rec.parts:
+                    groups.setdefault(part.material, []).append(
+                        meshops.compact(rec.co, part.tris, part.polys))
+        itgroup = bautils.ItOp(list(groups.items()))
+        for mat, items in itgroup.loop():
+            merged = state.scene.add(sceneir.MeshRecord(mat.name if not mat.name is None else "none"))
+            merged.material = mat
+            merged.co, merged.tris, merged.polys = meshops.merge(items)
+            merged.last = itgroup.last_get()
+            self.merge_stats["after"] += vrml.count_nodes(merged)
+
+    # 抽出結果をファイルに書き出し（ワーカースレッドでも実行できる。bpy には触れない）
+    # ------------------------------------------------------------------------------------------------
+    def write_file(self, filepath, state):
+        prof = self.prof
+        # 一時ファイルに書き出してから置き換える（中止・失敗したときに書きかけのファイルを残さない）
+        partpath = filepath + PARTIAL_EXT
+        try:
+            # VRML バックエンドで出力
+            with prof.phase("format"):
+                sizes = vrml.save_scene(partpath, state.scene, compact=self.use_compact, cache=self.tess_cache,
+                                        prof=prof if prof.enabled else None, compress_level=self.compress_level)
+            os.replace(partpath, filepath)
+        # ※出力先が無いとき等の例外はそのまま送出し、オペレーターに報告する
+        except BaseException:
+            remove_file(partpath)
+            raise
+        # 計測するときはオブジェクト・ファイル毎の出力内容を記録
+        if prof.enabled:
+            name = os.path.basename(filepath)
+            vertices = triangles = 0
+            for mesh, size in zip(state.scene.meshes, sizes):
+                # 定義済みジオメトリを参照するときは 0（キャッシュから取得したときは不明なので None）
+                mesh_vertices = len(mesh.co) if not mesh.co is None else (None if not mesh.body is None else 0)
+                mesh_triangles = len(mesh.tris) if not mesh.tris is None else (None if not mesh.body is None else 0)
+                # マテリアル毎に分割したときは部分毎の三角形数の合計
+                if (not mesh.parts is None) and (not mesh.co is None):
+                    mesh_triangles = sum(len(part.tris) for part in mesh.parts)
+                # ※オブジェクト毎の出力サイズは圧縮前の文字数（ファイルのバイト数とは一致しない）
+                # ※最大常駐メモリはプロセス全体の値なので、オブジェクト毎ではなく計測結果全体（peak_memory）で記録する
+                prof.object(file=name, name=mesh.name, vertices=mesh_vertices, triangles=mesh_triangles, chars=size)
+                vertices += mesh_vertices or 0
+                triangles += mesh_triangles or 0
+            size = os.path.getsize(filepath)
+            prof.file(file=name, objects=len(state.scene.meshes), vertices=vertices, triangles=triangles, bytes=size)
+            prof.count("files")
+            prof.count("objects", len(state.scene.meshes))
+            prof.count("vertices", vertices)
+            prof.count("triangles", triangles)
+            prof.count("bytes", size)
 
-            # オブジェクトの保存
-            self.save_objects(objects)
+    # ファイルに出力
+    # ------------------------------------------------------------------------------------------------
+    def save_to_file(self, filepath, objects, local_origin):
+        run_steps(self.iter_save_to_file(filepath, objects, local_origin))
 
-        except FileNotFoundError as e:
-            pass
-        finally:
-            if not file is None:
-                file.close()
+    # ファイルに出力（オブジェクト毎に進捗を返すジェネレーター）
+    # ------------------------------------------------------------------------------------------------
+    def iter_save_to_file(self, filepath, objects, local_origin):
+        state = yield from self.iter_extract_objects(objects, local_origin)
+        self.write_file(filepath, state)
 
     # コレクション収集
     # ------------------------------------------------------------------------------------------------
     def target_collect(self, *args):
         for target in args:
             if type(target) is tuple or type(target) is list:
-                for child in target:
-                    if not child in self.target_objs:
-                        self.target_objs.append(child)
+                self.target_objs.update(target)
             else:
-                if not target in self.target_objs:
-                    self.target_objs.append(target)
+                self.target_objs.add(target)
 
     # 位置情報別のコレクション収集
     # ------------------------------------------------------------------------------------------------
     def location_map_collect(self, location, *args, subkey=None):
         # 位置情報(恐らくVector)をタプルに置換
         loc = tuple(location)
+        # 位置情報が未登録のとき
+        if not loc in self.origin_objs:
+            # 位置情報要素を登録（サブキー指定ありは空辞書、なしは空集合）
+            self.origin_objs[loc] = {} if not subkey is None else bautils.IndexedSet()
         # サブキー指定ありのとき
         if not subkey is None:
-            # 位置情報が未登録のとき
-            if not loc in self.origin_objs:
-                # 位置情報要素の空辞書を登録
-                self.origin_objs[loc] = {}
             # サブキー要素が未登録のとき
             if not subkey in self.origin_objs[loc]:
-                # サブキー要素の空リストを登録
-                self.origin_objs[loc][subkey] = []
-            for target in args:
-                # ターゲットがtuple/listのいずれかのとき
-                if type(target) is tuple or type(target) is list:
-                    for child in target:
-                        # オブジェクトが未登録のとき
-                        if not child in self.origin_objs[loc][subkey]:
-                            self.origin_objs[loc][subkey].append(child)
-                # ターゲットがtuple/listの何れもなく、オブジェクトが未登録のとき
-                elif not target in self.origin_objs[loc][subkey]:
-                    self.origin_objs[loc][subkey].append(target)
+                # サブキー要素の空集合を登録
+                self.origin_objs[loc][subkey] = bautils.IndexedSet()
+            collect = self.origin_objs[loc][subkey]
         # サブキー指定なしのとき
         else:
-            # 位置情報が未登録のとき
-            if not loc in self.origin_objs:
-                # 位置情報要素の空リストを登録
-                self.origin_objs[loc] = []
-
-            for target in args:
-                # ターゲットがtuple/listのいずれかのとき
-                if type(target) is tuple or type(target) is list:
-                    for child in target:
-                        # サブキー指定なしでオブジェクトが未登録のとき
-                        if not child in self.origin_objs[loc]:
-                            self.origin_objs[loc].append(child)
-                # ターゲットがtuple/listの何れもなく、オブジェクトが未登録のとき
-                elif not target in self.origin_objs[loc]:
-                    self.origin_objs[loc].append(target)
+            collect = self.origin_objs[loc]
+
+        for target in args:
+            # ターゲットがtuple/listのいずれかのとき
+            if type(target) is tuple or type(target) is list:
+                # 未登録のオブジェクトのみ追加される
+                collect.update(target)
+            # ターゲットがtuple/listの何れもないとき
+            else:
+                collect.add(target)
 
     # ------------------------------------------------------------------------------------------------
     def collector(self, context):
           
-        # 収集コレクションの初期化
-        self.target_objs = []
+        # 収集コレクションの初期化（挿入順を保持し、登録済み判定を O(1) で行う）
+        self.target_objs = bautils.IndexedSet()
         self.origin_objs = {}
+        # 階層インデックスの作成
+        self.hierarchy_index(context.scene.objects)
 
         # 全オブジェクトを登録リストに追加
         it_objs = bautils.ItOp(context.scene.objects)
-        for obj in it_objs.loop(lambda o: self.avail_obj(o)):
+        for obj in it_objs.loop(lambda o: self.is_avail(o)):
             # 対象外はスキップ(メッシュ and 表示 and ([選択のみ]なしor[選択のみ]で選択済))
             # if not self.avail_obj(obj):
             #     continue
@@ -422,13 +1164,13 @@ class MeshExporter:
                 # ワールド原点を中心とするとき
                 if  self.use_worigin_to_center:
                     # 親が収集対象に該当するとき
-                    if self.avail_obj(parent_obj):
+                    if self.is_avail(parent_obj):
                         # 親オブジェクトを収集
                         self.target_collect(parent_obj)
                     self.target_collect(obj, children)
                 else:
                     # 親が収集対象に該当するとき
-                    if self.avail_obj(parent_obj):
+                    if self.is_avail(parent_obj):
                         # 親オブジェクトを収集
                         self.location_map_collect(parent_loc, parent_obj)
                     self.location_map_collect(parent_loc, obj, children)
@@ -447,13 +1189,24 @@ class MeshExporter:
     # エクスポート実行
     # ------------------------------------------------------------------------------------------------
     def execute(self, operator, filepath):
+        run_steps(self.iter_execute(operator, filepath))
+
+    # 出力（オブジェクト毎に進捗を返すジェネレーター）
+    # 途中で close されたときは、開始前の書き出しを取り消し、書き出しを完了したファイルは残す
+    # ------------------------------------------------------------------------------------------------
+    def iter_execute(self, operator, filepath):
         # マトリクス設定
         self.local_matrix = self.global_matrix * self.global_scale
-        # 平行移動量初期値（移動なし）
-        self.local_origin = mathutils.Matrix.Translation((0, 0, 0))
+        # 対象オブジェクト数
+        if len(self.target_objs) > 0:
+            self.progress["total"] = len(self.target_objs)
+        else:
+            self.progress["total"] = sum(len(collect) for collect in self.origin_objs.values())
         # ワールド原点を中心とするオブジェクト収集があるとき
         if len(self.target_objs) > 0:
-            self.save_to_file(filepath, self.target_objs)
+            # 平行移動量（移動なし）
+            # ※書き出しは抽出の完了後に一括で行うので、中止されたときに書きかけのファイルは残らない
+            yield from self.iter_save_to_file(filepath, self.target_objs, mathutils.Matrix.Translation((0, 0, 0)))
             # 完了メッセージ差k製
             completed_msg = localeui.gtext("CompletedOutput", "%s の出力を完了しました。")
             # レポート出力
@@ -461,30 +1214,115 @@ class MeshExporter:
         else:
             # 原点別オブジェクトの出力
             cfiles = 0
+            cskips = 0
             msgs = []
-            for origin in self.origin_objs:
-                # 平行移動量
-                self.local_origin = mathutils.Matrix.Translation(-mathutils.Vector(origin))
-                # モデルのオブジェクトリストを取得
-                collect = self.origin_objs[origin]
-                # オブジェクト名でソート
-                sublist = sorted(collect, key=lambda o: o.name)
-                # 生成ファイルパスの取得
-                subpath = bautils.get_subpath(filepath, sublist[0].name)
-                # ファイルへ保存
-                self.save_to_file(subpath, collect)
-                cfiles = cfiles + 1
-                proceeded_msg = localeui.gtext("ProceededOutput", "%s を出力しました。")
-                msgs.append(proceeded_msg % (os.path.basename(subpath)))
+            # 差分エクスポートのとき、前回のマニフェストを読み込む
+            manifest_path = filepath + MANIFEST_EXT
+            manifest = self.load_manifest(manifest_path) if self.use_incremental else {}
+            new_manifest = {}
+            # 抽出はメインスレッド、整形と書き込みはワーカースレッドで行う
+            # ※bpy はメインスレッド以外から触れないため、ワーカーには抽出結果のみを渡す
+            workers = self.workers if self.workers > 0 else (os.cpu_count() or 1)
+            # この出力で書き出しを依頼したファイル（ファイルパス, Future）
+            submitted = []
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                try:
+                    pending = collections.deque()
+                    for origin in self.origin_objs:
+                        # 平行移動量
+                        local_origin = mathutils.Matrix.Translation(-mathutils.Vector(origin))
+                        # モデルのオブジェクトリストを取得
+                        collect = self.origin_objs[origin]
+                        # オブジェクト名でソート
+                        sublist = sorted(collect, key=lambda o: o.name)
+                        # 生成ファイルパスの取得
+                        subpath = bautils.get_subpath(filepath, sublist[0].name)
+                        # 差分エクスポートのとき
+                        if self.use_incremental:
+                            subname = os.path.basename(subpath)
+                            with self.prof.phase("digest"):
+                                new_manifest[subname] = self.group_digest(collect, local_origin)
+                            # 前回から変更がなく、ファイルが存在するときはスキップ
+                            if (manifest.get(subname) == new_manifest[subname]) and os.path.exists(subpath):
+                                cskips = cskips + 1
+                                skipped_msg = localeui.gtext("SkippedOutput", "%s は変更がないためスキップしました。")
+                                msgs.append(skipped_msg % (subname))
+                                # スキップしたオブジェクトも処理済みとして数える（進捗が対象数に達するように）
+                                self.progress["objects"] += len(collect)
+                                continue
+                        # メッシュの抽出
+                        state = yield from self.iter_extract_objects(collect, local_origin)
+                        # ファイルへの書き出しをワーカーに依頼
+                        pending.append(pool.submit(self.write_file, subpath, state))
+                        submitted.append((subpath, pending[-1]))
+                        # 書き出し待ちが多いときは古いものの完了を待つ（抽出結果を溜め込まない）
+                        while len(pending) > workers * 2:
+                            pending.popleft().result()
+                        cfiles = cfiles + 1
+                        proceeded_msg = localeui.gtext("ProceededOutput", "%s を出力しました。")
+                        msgs.append(proceeded_msg % (os.path.basename(subpath)))
+                    # 全ファイルの書き出し完了を待つ（ワーカーの例外はここで送出される）
+                    while len(pending) > 0:
+                        pending.popleft().result()
+                except GeneratorExit:
+                    # 中止されたとき、開始前の書き出しを取り消し、書き出し中のものは完了を待つ
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    # ※書き出しは一時ファイルから置き換えるので、取り消した・失敗したファイルは前回の内容のまま
+                    # 差分エクスポートのとき、書き出しを完了したファイルのみマニフェストを更新（次回スキップできるように）
+                    if self.use_incremental:
+                        for subpath, future in submitted:
+                            if (not future.cancelled()) and (future.exception() is None):
+                                subname = os.path.basename(subpath)
+                                manifest[subname] = new_manifest[subname]
+                        self.save_manifest(manifest_path, manifest)
+                    raise
             # 完了メッセージ差k製
             count_msg = localeui.gtext("CompletedCountOutput", "件のファイル出力を完了しました。")
             msgs.append(count_msg % (cfiles))
+            # 差分エクスポートのとき
+            if self.use_incremental:
+                # マニフェストの更新
+                self.save_manifest(manifest_path, new_manifest)
+                skip_msg = localeui.gtext("SkippedCountOutput", "%d 件のファイルは変更がないためスキップしました。")
+                msgs.append(skip_msg % (cskips))
             # レポート出力
             operator.report({'INFO'}, '\n'.join(msgs))
 
+# ファイルの削除（無いときは何もしない）
+# ================================================================================================================================
+def remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+# ジェネレーターを最後まで実行して戻り値を返す
+# ================================================================================================================================
+def run_steps(steps):
+    while True:
+        try:
+            next(steps)
+        except StopIteration as e:
+            return e.value
+
+# 抽出結果の三角形数（キャッシュから取得したとき、定義済みジオメトリを参照するときは 0）
+# ================================================================================================================================
+def record_triangles(rec):
+    if rec.co is None:
+        return 0
+    # マテリアル毎に分割したときは部分毎の三角形数の合計
+    if not rec.parts is None:
+        return sum(len(part.tris) for part in rec.parts)
+    return len(rec.tris)
+
 # エクスポートメインエントリ
 # ================================================================================================================================
-def save(operator,
+def save(operator, context, **keywords):
+    return run_steps(iter_save(operator, context, **keywords))
+
+# エクスポート（オブジェクト毎に進捗 MeshExporter.progress を返すジェネレーター。戻り値はオペレーターの戻り値）
+# ================================================================================================================================
+def iter_save(operator,
          context,
          filepath="",
          global_matrix=None,
@@ -493,7 +1331,28 @@ def save(operator,
          use_worigin_to_center=False,
          use_mesh_modifiers=True,
          fetch_children=False,
-         color_mag=1.5000):
+         color_mag=1.5000,
+         use_compact=False,
+         use_instancing=True,
+         use_dedup_geometry=False,
+         use_tess_cache=False,
+         cache_dir="",
+         cache_size=512,
+         use_incremental=False,
+         workers=0,
+         use_gzip=False,
+         compress_level=6,
+         quantize='NONE',
+         decimals=4,
+         grid_step=0.001,
+         use_cleanup=False,
+         use_ngons=False,
+         use_material_split=True,
+         use_bake_transforms=False,
+         use_merge_shapes=False,
+         chunk_size=0,
+         use_profile=False,
+         profile_output='NONE'):
 
     mexp = MeshExporter()
     mexp.global_matrix = global_matrix
@@ -503,9 +1362,78 @@ def save(operator,
     mexp.use_mesh_modifiers = use_mesh_modifiers
     mexp.fetch_children = fetch_children
     mexp.color_mag = color_mag
+    mexp.use_compact = use_compact
+    mexp.use_instancing = use_instancing
+    mexp.use_dedup_geometry = use_dedup_geometry
+    mexp.use_incremental = use_incremental
+    mexp.workers = workers
+    mexp.compress_level = compress_level if use_gzip else None
+    # 頂点座標を量子化するとき
+    if quantize == 'DECIMALS':
+        mexp.quantize_step = 10.0 ** -decimals
+        mexp.decimals = decimals
+    elif quantize == 'GRID':
+        mexp.quantize_step = grid_step
+        mexp.decimals = meshops.step_decimals(grid_step)
+    mexp.use_ngons = use_ngons
+    mexp.use_material_split = use_material_split
+    mexp.use_bake_transforms = use_bake_transforms
+    # シェイプを統合するとき（トランスフォームは頂点座標に適用する）
+    if use_merge_shapes:
+        mexp.use_merge_shapes = True
+        mexp.use_bake_transforms = True
+        mexp.merge_stats = {"before": 0, "after": 0}
+    mexp.chunk_size = chunk_size
+    # メッシュをクリーンアップするとき
+    if use_cleanup:
+        mexp.cleanup_stats = {"degenerate": 0, "duplicate": 0, "unused": 0}
+    # 計測するとき
+    if use_profile:
+        mexp.prof = profiler.Profiler(trace=(profile_output == 'TRACE'))
+    # テッセレーションキャッシュを使うとき
+    if use_tess_cache:
+        if len(cache_dir) == 0:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "io_scene_kicad")
+        mexp.tess_cache = tesscache.TessCache(bpy.path.abspath(cache_dir), cache_size * 1024 * 1024)
+    with mexp.prof.phase("depsgraph"):
+        mexp.depsgraph = context.evaluated_depsgraph_get()
+
+    with mexp.prof.phase("collect"):
+        mexp.collector(context)
+    # ※バックグラウンド出力では以降の処理をタイマーから進めるため、実行時のコンテキストは保持しない
+    del context
+    try:
+        yield from mexp.iter_execute(operator, filepath)
+    except OSError as e:
+        # 書き込みスレッドで発生した例外（ディスクの空き不足、ネットワークドライブの切断等）を報告して中止
+        error_msg = localeui.gtext("WriteError", "ファイルの書き込みに失敗しました: %s")
+        operator.report({'ERROR'}, error_msg % e)
+        return {'CANCELLED'}
+
+    # キャッシュの統計情報を出力
+    if not mexp.tess_cache is None:
+        stats_msg = localeui.gtext("CacheStats", "テッセレーションキャッシュ: ヒット %(hits)d, ミス %(misses)d, 保存 %(stores)d, 削除 %(evictions)d, %(entries)d 件 %(bytes)d バイト")
+        operator.report({'INFO'}, stats_msg % mexp.tess_cache.stats())
+
+    # クリーンアップで削除した数を出力
+    if not mexp.cleanup_stats is None:
+        cleanup_msg = localeui.gtext("CleanupStats", "クリーンアップ: 面積ゼロの三角形 %(degenerate)d, 重複した三角形 %(duplicate)d, 未使用の頂点 %(unused)d を削除しました。")
+        operator.report({'INFO'}, cleanup_msg % mexp.cleanup_stats)
+
+    # シェイプの統合前後のノード数を出力
+    if not mexp.merge_stats is None:
+        merge_msg = localeui.gtext("MergeStats", "シェイプの統合: ノード数 %(before)d → %(after)d")
+        operator.report({'INFO'}, merge_msg % mexp.merge_stats)
 
-    mexp.collector(context)
-    mexp.execute(operator, filepath)
+    # 計測結果を出力
+    if use_profile:
+        profile_msg = localeui.gtext("ProfileSummary", "計測: %s")
+        operator.report({'INFO'}, profile_msg % mexp.prof.summary())
+        if profile_output != 'NONE':
+            profile_path = filepath + (TRACE_EXT if profile_output == 'TRACE' else PROFILE_EXT)
+            mexp.prof.save(profile_path, chrome=(profile_output == 'TRACE'))
+            saved_msg = localeui.gtext("ProfileSaved", "計測結果を %s に保存しました。")
+            operator.report({'INFO'}, saved_msg % profile_path)
 
     return {'FINISHED'}
 
@@ -0,0 +1,286 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+import math
+import numpy as np
+
+# メッシュ配列の処理
+# ================================================================================================================================
+# 抽出した頂点座標・三角形インデックスの配列を NumPy でまとめて処理します（bpy に依存しません）。
+# 多角形はインデックスを -1 で区切った1次元の配列（VRML の coordIndex と同じ形式）で扱います。
+#
+# ※このモジュールはパッケージ内の他のモジュールを import しない（単独で読み込めるようにする）
+#
+
+# 格子間隔を表すのに必要な小数点以下の桁数を取得
+# ================================================================================================================================
+def step_decimals(step, limit=9):
+    for decimals in range(limit + 1):
+        scaled = step * 10 ** decimals
+        if abs(scaled - round(scaled)) < 1e-6 * max(1.0, scaled):
+            return decimals
+    return limit
+
+# インデックスの付け替え（区切りの -1 はそのまま）
+# ================================================================================================================================
+def remap_indices(index, indices):
+    if indices is None:
+        return None
+    return np.where(indices < 0, indices, index[indices]).astype(np.int32)
+
+# 頂点座標の量子化
+# 頂点座標を格子間隔の整数倍に丸め、丸めた結果が同じになった頂点を1つにまとめてインデックスを付け替えます。
+# まとめた頂点は最初に現れた位置の順序を保ちます。
+# polys: 多角形のインデックス配列（無いときは None）
+# 戻り値: (頂点座標の配列, 三角形インデックスの配列, 多角形のインデックス配列, まとめた頂点数)
+# ================================================================================================================================
+def quantize(co, tris, step, polys=None):
+    grid = np.round(co.astype(np.float64) / step).astype(np.int64)
+    if len(grid) == 0:
+        return (grid.astype(np.float64), tris, polys, 0)
+    _, first, inverse = np.unique(grid, axis=0, return_index=True, return_inverse=True)
+    # 一意な頂点を最初に現れた順に並べ替える
+    order = np.argsort(first)
+    remap = np.empty(len(order), dtype=np.int64)
+    remap[order] = np.arange(len(order))
+    index = remap[inverse.reshape(-1)]
+    # ※0.0 を加えて -0.0 を 0.0 にする（"-0" を出力しないため）
+    co = grid[first[order]] * step + 0.0
+    return (co, index[tris].astype(np.int32), remap_indices(index, polys), len(grid) - len(order))
+
+# 頂点をまとめて潰れた面の削除
+# 同じ頂点を含む三角形を取り除き、多角形は連続する同じ頂点を1つにして、3頂点未満になったもの・同じ頂点を含むものを取り除きます。
+# tri_labels / poly_labels: 三角形毎 / 多角形毎の値の配列（面と一緒に削除する、無いときは None）
+# 戻り値: (三角形インデックスの配列, 多角形のインデックス配列, 三角形毎の値の配列, 多角形毎の値の配列, 削除した面数)
+# ================================================================================================================================
+def drop_collapsed(tris, polys=None, tri_labels=None, poly_labels=None):
+    keep = (tris[:, 0] != tris[:, 1]) & (tris[:, 1] != tris[:, 2]) & (tris[:, 2] != tris[:, 0])
+    dropped = len(tris) - int(np.count_nonzero(keep))
+    if dropped > 0:
+        tris = tris[keep]
+        if not tri_labels is None:
+            tri_labels = tri_labels[keep]
+    if (not polys is None) and len(polys) > 0:
+        ends = np.flatnonzero(polys < 0)
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        lengths = ends - starts
+        pid = np.repeat(np.arange(len(ends)), lengths + 1)
+        local = np.arange(len(polys)) - starts[pid]
+        # 巡回順で1つ前の頂点と同じ要素を取り除く（区切りの -1 は残す）
+        prev = starts[pid] + (local - 1) % np.maximum(lengths[pid], 1)
+        elem = (polys >= 0) & (polys == polys[prev])
+        # 残りの頂点数が3未満、または、同じ頂点が残る多角形
+        counts = lengths - np.bincount(pid[elem], minlength=len(ends))
+        order = np.lexsort((polys, pid))
+        same = (pid[order][1:] == pid[order][:-1]) & (polys[order][1:] == polys[order][:-1]) & (polys[order][1:] >= 0)
+        repeats = np.bincount(pid[order][1:][same], minlength=len(ends)) - np.bincount(pid[elem], minlength=len(ends))
+        keep = (counts >= 3) & (repeats == 0)
+        if np.any(elem) or not np.all(keep):
+            dropped += len(ends) - int(np.count_nonzero(keep))
+            polys = polys[~elem & keep[pid]].astype(np.int32)
+            if not poly_labels is None:
+                poly_labels = poly_labels[keep]
+    return (tris, polys, tri_labels, poly_labels, dropped)
+
+# 頂点座標の変換（4x4 の変換マトリクスを全頂点にまとめて適用）
+# ================================================================================================================================
+def transform(co, matrix):
+    matrix = np.asarray(matrix, dtype=np.float64)
+    return co.astype(np.float64) @ matrix[:3, :3].T + matrix[:3, 3]
+
+# 面の向き（頂点の巡回順）の反転
+# 鏡像（行列式が負）の変換を頂点座標に適用したとき、表裏が入れ替わらないよう反転する。
+# 戻り値: (三角形インデックスの配列, 多角形のインデックス配列)
+# ================================================================================================================================
+def flip_winding(tris, polys=None):
+    tris = np.ascontiguousarray(tris[:, ::-1])
+    if (not polys is None) and len(polys) > 0:
+        # 各多角形の要素を区切りの -1 の手前まで逆順に並べ替える
+        ends = np.flatnonzero(polys < 0)
+        starts = np.concatenate(([0], ends[:-1] + 1))
+        lengths = ends - starts
+        pid = np.repeat(np.arange(len(ends)), lengths + 1)
+        local = np.arange(len(polys)) - starts[pid]
+        source = np.where(local < lengths[pid], starts[pid] + lengths[pid] - 1 - local, np.arange(len(polys)))
+        polys = polys[source]
+    return (tris, polys)
+
+# 面積ゼロとみなす三角形の面積（2倍値）の上限（座標値の単位の2乗）
+AREA_EPSILON = 1e-12
+
+# メッシュのクリーンアップ
+# 面積ゼロの三角形、重複した三角形、どの三角形からも使われていない頂点を取り除き、インデックスを詰め直します。
+# 重複の判定は頂点の巡回順（面の向き）を区別する（裏表の2枚で両面にしている面は残す）。
+# 多角形は削除の対象外（使っている頂点を残し、インデックスを付け替える）。
+# labels: 三角形毎の値の配列（三角形と一緒に削除する、無いときは None）
+# 戻り値: (頂点座標の配列, 三角形インデックスの配列, 多角形のインデックス配列, 三角形毎の値の配列, 削除数の辞書)
+# ================================================================================================================================
+def cleanup(co, tris, polys=None, labels=None):
+    removed = {"degenerate": 0, "duplicate": 0, "unused": 0}
+    # 残す三角形の位置
+    kept = np.arange(len(tris))
+    count = len(tris)
+    if count > 0:
+        # 面積ゼロの三角形（同じ頂点を含むもの、及び、頂点が一直線上にあるもの）
+        v0, v1, v2 = (co[tris[:, i]].astype(np.float64) for i in range(3))
+        cross = np.cross(v1 - v0, v2 - v0)
+        area = np.sqrt(np.einsum('ij,ij->i', cross, cross))
+        kept = kept[area > AREA_EPSILON]
+        tris = tris[kept]
+        removed["degenerate"] = count - len(tris)
+    count = len(tris)
+    if count > 0:
+        # 最小のインデックスが先頭になるよう巡回させて比較する（巡回順は保つ）
+        shift = np.argmin(tris, axis=1)
+        order = (shift[:, np.newaxis] + np.arange(3)) % 3
+        canon = np.take_along_axis(tris, order, axis=1)
+        _, first = np.unique(canon, axis=0, return_index=True)
+        # 最初に現れた三角形を元の順序で残す
+        kept = kept[np.sort(first)]
+        tris = tris[np.sort(first)]
+        removed["duplicate"] = count - len(tris)
+    # 未使用の頂点を取り除き、インデックスを詰め直す
+    count = len(co)
+    co, tris, polys = compact(co, tris, polys)
+    removed["unused"] = count - len(co)
+    if not labels is None:
+        labels = labels[kept]
+    return (co, tris, polys, labels, removed)
+
+# 未使用の頂点の削除
+# どの三角形・多角形からも使われていない頂点を取り除き、インデックスを詰め直します。
+# 戻り値: (頂点座標の配列, 三角形インデックスの配列, 多角形のインデックス配列)
+# ================================================================================================================================
+def compact(co, tris, polys=None):
+    used = np.zeros(len(co), dtype=bool)
+    used[tris.reshape(-1)] = True
+    if not polys is None:
+        used[polys[polys >= 0]] = True
+    if np.all(used):
+        return (co, tris, polys)
+    remap = np.cumsum(used) - 1
+    return (co[used], remap[tris].astype(np.int32), remap_indices(remap, polys))
+
+# 複数のジオメトリの連結
+# 頂点座標を連結し、各ジオメトリのインデックスに先行する頂点数を加えます。
+# items: (頂点座標の配列, 三角形インデックスの配列, 多角形のインデックス配列 or None) のリスト
+# 戻り値: (頂点座標の配列, 三角形インデックスの配列, 多角形のインデックス配列 or None)
+# ================================================================================================================================
+def merge(items):
+    counts = [len(co) for co, _, _ in items]
+    offsets = np.cumsum([0] + counts[:-1])
+    co = np.concatenate([co.astype(np.float64) for co, _, _ in items])
+    tris = np.concatenate([tris + offset for (_, tris, _), offset in zip(items, offsets)]).astype(np.int32)
+    polys = None
+    # 多角形を含むジオメトリがあるとき
+    if any(not polys is None for _, _, polys in items):
+        polys = np.concatenate([np.where(polys < 0, polys, polys + offset)
+                                for (_, _, polys), offset in zip(items, offsets) if not polys is None]).astype(np.int32)
+    return (co, tris, polys)
+
+# 平面とみなす頂点の面からの距離の上限（面の大きさに対する比）
+PLANAR_TOLERANCE = 1e-4
+
+# 平面かつ凸の多角形の判定（4頂点以上の面のみ True）
+# loop_vertices: ループ毎の頂点インデックス
+# loop_start, loop_total: 面毎のループの開始位置とループ数
+# 戻り値: 面毎の判定結果（bool の配列）
+# ================================================================================================================================
+def flat_convex(co, loop_vertices, loop_start, loop_total, tolerance=PLANAR_TOLERANCE):
+    if len(loop_total) == 0:
+        return np.zeros(0, dtype=bool)
+    # 面毎に連続して並べたループの、面内での位置
+    offset = np.cumsum(loop_total) - loop_total
+    local = np.arange(int(loop_total.sum())) - np.repeat(offset, loop_total)
+    start = np.repeat(loop_start, loop_total)
+    total = np.repeat(loop_total, loop_total)
+    p = co[loop_vertices[start + local]].astype(np.float64)
+    p_next = co[loop_vertices[start + (local + 1) % total]].astype(np.float64)
+    p_prev = co[loop_vertices[start + (local - 1) % total]].astype(np.float64)
+    # 面の中心からの位置で Newell 法の法線を求める（長さは面積の2倍）
+    center = np.add.reduceat(p, offset) / loop_total[:, np.newaxis]
+    q = p - np.repeat(center, loop_total, axis=0)
+    q_next = p_next - np.repeat(center, loop_total, axis=0)
+    normal = np.add.reduceat(np.cross(q, q_next), offset)
+    length = np.sqrt(np.einsum('ij,ij->i', normal, normal))
+    unit = normal / np.where(length > 0, length, 1.0)[:, np.newaxis]
+    unit_loops = np.repeat(unit, loop_total, axis=0)
+    size = np.sqrt(length)
+    # 平面：全頂点の面からの距離が許容範囲内
+    distance = np.abs(np.einsum('ij,ij->i', q, unit_loops))
+    flat = np.maximum.reduceat(distance, offset) <= tolerance * size
+    # 凸：全頂点で曲がる向きが法線と同じで、外角の合計が1周分（自己交差する星形を除く）
+    edge_in = p - p_prev
+    edge_out = p_next - p
+    turn = np.einsum('ij,ij->i', np.cross(edge_in, edge_out), unit_loops)
+    angle = np.arctan2(turn, np.einsum('ij,ij->i', edge_in, edge_out))
+    convex = (np.minimum.reduceat(turn, offset) >= -tolerance * length) & \
+             (np.abs(np.add.reduceat(angle, offset) - 2 * math.pi) < 1e-3)
+    # 長さゼロの辺（同じ頂点・同じ位置の頂点が続く）を含まない
+    # ※長さゼロの辺では曲がる角度が定まらず、外角の合計で判定できない
+    distinct = np.minimum.reduceat(np.einsum('ij,ij->i', edge_out, edge_out), offset) > 0
+    return (loop_total > 3) & (length > 0) & flat & convex & distinct
+
+# 多角形のインデックス配列（-1 区切り）の作成
+# mask: 出力する面（bool の配列）
+# ================================================================================================================================
+def polygon_stream(loop_vertices, loop_start, loop_total, mask):
+    start = loop_start[mask]
+    total = loop_total[mask]
+    if len(total) == 0:
+        return np.zeros(0, dtype=np.int32)
+    # 各面のループに区切りの分を1つ加えて並べる
+    offset = np.cumsum(total + 1) - (total + 1)
+    local = np.arange(int(total.sum()) + len(total)) - np.repeat(offset, total + 1)
+    loops = np.repeat(start, total + 1) + local
+    stream = loop_vertices[np.minimum(loops, len(loop_vertices) - 1)]
+    stream[local == np.repeat(total, total + 1)] = -1
+    return stream.astype(np.int32)
+
+# 面の値（マテリアル番号等）毎の分割
+# 値の順に1回の安定ソートで並べ替え、値毎の三角形・多角形を元の順序のまま切り出します。
+# tri_labels: 三角形毎の値
+# poly_labels: 多角形毎の値（多角形が無いときは None）
+# 戻り値: (値, 三角形インデックスの配列, 多角形のインデックス配列 or None) のリスト（値の昇順）
+# ================================================================================================================================
+def split_faces(tris, tri_labels, polys=None, poly_labels=None):
+    order = np.argsort(tri_labels, kind='stable')
+    tris = tris[order]
+    tri_labels = tri_labels[order]
+    values = tri_labels
+    if not polys is None:
+        # 多角形の各要素（区切りの -1 を含む）に所属する多角形の値を割り当てて並べ替える
+        ends = polys < 0
+        elem_labels = poly_labels[np.cumsum(ends) - ends]
+        order = np.argsort(elem_labels, kind='stable')
+        polys = polys[order]
+        elem_labels = elem_labels[order]
+        values = np.concatenate((values, elem_labels))
+    parts = []
+    for value in np.unique(values).tolist():
+        sta, end = np.searchsorted(tri_labels, (value, value + 1))
+        part_polys = None
+        if not polys is None:
+            psta, pend = np.searchsorted(elem_labels, (value, value + 1))
+            part_polys = polys[psta:pend]
+        parts.append((value, tris[sta:end], part_polys))
+    return parts
+
+# ================================================================================================================================
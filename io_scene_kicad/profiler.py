@@ -0,0 +1,215 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+import json
+import os
+import sys
+import threading
+import time
+try:
+    import resource
+except ImportError:
+    # Windows では使えない（メモリの計測は行わない）
+    resource = None
+
+# エクスポートの計測
+# ================================================================================================================================
+# フェーズ毎の時間と呼び出し回数、オブジェクト・ファイル毎の頂点数・三角形数・出力サイズ（オブジェクトは圧縮前の文字数、ファイルはバイト数）と、
+# エクスポート全体の最大常駐メモリを記録します。
+# フェーズは入れ子にでき、集計では内側のフェーズの時間を除いた時間（自己時間）を使います。
+# 計測しないときは NULL（NullProfiler）を使い、呼び出し側のコストをほぼなくします。
+#
+# ※このモジュールはパッケージ内の他のモジュールを import しない（単独で読み込めるようにする）
+#
+
+# 計測区間（with 文で使う）
+# ================================================================================================================================
+class Span:
+    __slots__ = ("prof", "name", "start", "child")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+        self.child = 0.0
+
+    def __enter__(self):
+        self.prof.stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        stack = self.prof.stack()
+        stack.pop()
+        elapsed = end - self.start
+        # 親の区間には内側の時間として加算
+        if len(stack) > 0:
+            stack[-1].child += elapsed
+        self.prof.add(self.name, elapsed, elapsed - self.child, self.start, end)
+        return False
+
+# 計測
+# ================================================================================================================================
+class Profiler:
+
+    enabled = True
+
+    # コンストラクタ
+    # trace: Chrome トレース形式の出力用にイベントを記録するか否か
+    # ----------------------------------------------------------------
+    def __init__(self, trace=False):
+        self.trace = trace
+        self.origin = time.perf_counter()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        # フェーズ名 -> [合計時間, 自己時間, 回数]
+        self.phases = {}
+        # カウンター名 -> 値
+        self.counters = {}
+        # オブジェクト・ファイル毎の記録
+        self.objects = []
+        self.files = []
+        # Chrome トレースのイベント
+        self.events = []
+
+    # スレッド毎の区間のスタック
+    # ----------------------------------------------------------------
+    def stack(self):
+        stack = getattr(self.local, "stack", None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    # 計測区間の作成
+    # ----------------------------------------------------------------
+    def phase(self, name):
+        return Span(self, name)
+
+    # 区間の時間の加算
+    # ----------------------------------------------------------------
+    def add(self, name, elapsed, own, start, end):
+        with self.lock:
+            item = self.phases.get(name)
+            if item is None:
+                item = self.phases[name] = [0.0, 0.0, 0]
+            item[0] += elapsed
+            item[1] += own
+            item[2] += 1
+            if self.trace:
+                self.events.append({
+                    "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                    "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6,
+                })
+
+    # カウンターの加算
+    # ----------------------------------------------------------------
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # プロセスの最大常駐メモリ（バイト）の取得。計測できないときは None
+    # ----------------------------------------------------------------
+    def memory(self):
+        if resource is None:
+            return None
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS はバイト、その他は KB
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+    # オブジェクト毎の記録
+    # ----------------------------------------------------------------
+    def object(self, **values):
+        with self.lock:
+            self.objects.append(values)
+
+    # ファイル毎の記録
+    # ----------------------------------------------------------------
+    def file(self, **values):
+        with self.lock:
+            self.files.append(values)
+
+    # 集計結果の取得
+    # ----------------------------------------------------------------
+    def result(self):
+        return {
+            "elapsed": time.perf_counter() - self.origin,
+            "phases": {name: {"total": item[0], "self": item[1], "calls": item[2]} for name, item in self.phases.items()},
+            "counters": dict(self.counters),
+            "peak_memory": self.memory(),
+            "objects": list(self.objects),
+            "files": list(self.files),
+        }
+
+    # 1行の概要（自己時間の大きい順）
+    # ----------------------------------------------------------------
+    def summary(self):
+        items = sorted(self.phases.items(), key=lambda kv: -kv[1][1])
+        text = "%.3fs | " % (time.perf_counter() - self.origin)
+        text += ", ".join("%s %.3fs/%d" % (name, item[1], item[2]) for name, item in items)
+        if len(self.counters) > 0:
+            text += " | " + ", ".join("%s %d" % (name, value) for name, value in sorted(self.counters.items()))
+        memory = self.memory()
+        if not memory is None:
+            text += " | peak %.1f MB" % (memory / (1024 * 1024))
+        return text
+
+    # 計測結果をファイルに保存
+    # chrome: Chrome トレース形式（chrome://tracing, Perfetto で表示）で保存するか否か
+    # ----------------------------------------------------------------
+    def save(self, path, chrome=False):
+        with open(path, 'w', encoding='utf-8') as file:
+            if chrome:
+                json.dump({"traceEvents": self.events, "displayTimeUnit": "ms", "otherData": self.result()}, file)
+            else:
+                json.dump(self.result(), file, indent=1)
+
+# 計測しないときの代替（全て何もしない）
+# ================================================================================================================================
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+class NullProfiler:
+
+    enabled = False
+    span = NullSpan()
+
+    def phase(self, name):
+        return self.span
+
+    def count(self, name, value=1):
+        pass
+
+    def memory(self):
+        return None
+
+    def object(self, **values):
+        pass
+
+    def file(self, **values):
+        pass
+
+# 計測しないときに使う共有インスタンス
+NULL = NullProfiler()
@@ -0,0 +1,141 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+
+# シーンの中間表現
+# ================================================================================================================================
+# Blender 側（export_kicad.MeshExporter）が bpy から抽出して作成し、VRML バックエンド（vrml.py）が出力します。
+# 値は文字列・数値・タプルと NumPy 配列のみで構成し、bpy・mathutils に依存しません。
+# そのため Blender 外の Python で出力処理を計測・検証でき、pickle でプロセス間の受け渡しもできます。
+#
+# ※このモジュールはパッケージ内の他のモジュールを import しない（単独で読み込めるようにする）
+#
+
+# マテリアルの記録
+# ================================================================================================================================
+# 同じ内容のマテリアルは複数のメッシュで共有するので、作成後は変更しないこと。
+#
+class MaterialRecord:
+
+    # コンストラクタ
+    # name: マテリアル名（None のときはマテリアル定義なし）
+    # ----------------------------------------------------------------
+    def __init__(self, name=None):
+        self.name = name
+        # 拡散反射色 (r, g, b)
+        self.diffuse = (1, 1, 1)
+        # 光源反射色 (r, g, b)
+        self.emissive = (0, 0, 0)
+        # 鏡面反射色 (r, g, b)
+        self.specular = (0, 0, 0)
+        # 環境光反射率
+        self.ambient = 1.0
+        # 透過率
+        self.transparency = 0.0
+        # 鏡面反射率
+        self.shininess = 0.0
+
+# メッシュの記録
+# ================================================================================================================================
+# 1オブジェクト分の出力内容です。DEF/USE の判定は作成時に済ませておきます。
+#
+class MeshRecord:
+
+    # コンストラクタ
+    # name: オブジェクト名
+    # ----------------------------------------------------------------
+    def __init__(self, name):
+        self.name = name
+        # トランスフォーム（各要素のタプルのリスト。回転は軸と角度）
+        self.translation = []
+        self.rotation = []
+        self.scale = []
+        # マテリアル
+        self.material = MaterialRecord()
+        # Appearance の DEF 名
+        self.appearance_def = None
+        # 参照する Appearance の DEF 名（出力済みのとき）
+        self.appearance_use = None
+        # 頂点座標の配列（頂点数 x 3）、定義済みジオメトリを参照するときは None
+        self.co = None
+        # 三角形の頂点インデックス配列（三角形数 x 3）
+        self.tris = None
+        # 多角形の頂点インデックス配列（-1 区切りの1次元配列、多角形のまま出力しないときは None）
+        self.polys = None
+        # 整形済みのジオメトリ（キャッシュから取得したとき）
+        self.body = None
+        # ジオメトリの DEF 名（co、body が None のときは USE する名前）
+        self.geometry_def = None
+        # 参照するジオメトリの平行移動量（ローカル座標）
+        self.offset = None
+        # テッセレーションキャッシュのキーとメタ情報（保存しないときは None）
+        self.cache_key = None
+        self.cache_meta = None
+        # マテリアル毎の部分（マテリアル毎に分割しないときは None）
+        # ※分割するときは material、tris、polys、geometry_def の代わりに各部分の値を使う
+        self.parts = None
+        # 部分間で共有する Coordinate の DEF 名
+        self.coord_def = None
+        # 末尾の区切り文字
+        self.last = ""
+
+# マテリアル毎の部分の記録
+# ================================================================================================================================
+# 頂点座標はメッシュの記録（MeshRecord.co）を共有します。
+#
+class SubMeshRecord:
+
+    # コンストラクタ
+    # ----------------------------------------------------------------
+    def __init__(self):
+        # マテリアル
+        self.material = MaterialRecord()
+        # Appearance の DEF 名
+        self.appearance_def = None
+        # 参照する Appearance の DEF 名（出力済みのとき）
+        self.appearance_use = None
+        # 三角形の頂点インデックス配列、定義済みジオメトリを参照するときは None
+        self.tris = None
+        # 多角形の頂点インデックス配列（-1 区切りの1次元配列）
+        self.polys = None
+        # ジオメトリの DEF 名（tris が None のときは USE する名前）
+        self.geometry_def = None
+
+# シーン（出力ファイル1つ分）
+# ================================================================================================================================
+class SceneIR:
+
+    # コンストラクタ
+    # ----------------------------------------------------------------
+    def __init__(self):
+        # 出力順のメッシュの記録
+        self.meshes = []
+        # 頂点座標の小数点以下の桁数（None のときは有効数字6桁で出力する）
+        self.decimals = None
+        # 整形・出力を分割する行数（0 のときは一括で整形する）
+        self.chunk_size = 0
+
+    # メッシュの追加
+    # ----------------------------------------------------------------
+    def add(self, mesh):
+        self.meshes.append(mesh)
+        return mesh
+
+# ================================================================================================================================
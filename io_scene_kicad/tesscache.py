@@ -0,0 +1,231 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+import json
+import os
+import tempfile
+import threading
+import time
+
+# テッセレーション結果のディスクキャッシュ
+# ================================================================================================================================
+# 整形済みのジオメトリ（IndexedFaceSet の内容）をキー毎に1ファイルとしてキャッシュディレクトリへ保存します。
+# 合計サイズが上限を超えたときは、最後に使われた時刻（ファイルの更新時刻）が古いものから削除します（LRU）。
+#
+# ファイル形式: 1行目にメタ情報のJSON、2行目以降に整形済みテキスト
+# 複数のスレッドから呼び出せるよう、各操作は排他して行います。
+#
+class TessCache:
+
+    # キャッシュファイルの拡張子
+    EXT = ".wrlc"
+    # 書き込み中の一時ファイルの拡張子
+    TMP_EXT = ".tmp"
+    # 書き込み中のまま残った一時ファイルとみなす経過時間（秒）
+    STALE_SECONDS = 3600
+
+    # コンストラクタ
+    # dirpath: キャッシュディレクトリ
+    # max_bytes: キャッシュ合計サイズの上限（バイト）
+    # ----------------------------------------------------------------
+    def __init__(self, dirpath, max_bytes):
+        self.dirpath = dirpath
+        self.max_bytes = max_bytes
+        # 統計情報
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        # キー -> (最終使用時刻, サイズ)
+        self.entries = {}
+        self.total_bytes = 0
+        # 排他制御（保存時の削除から再入するため RLock）
+        self.lock = threading.RLock()
+        os.makedirs(dirpath, exist_ok=True)
+        # 既存のキャッシュファイルを登録
+        now = time.time()
+        for entry in os.scandir(dirpath):
+            if entry.is_file() and entry.name.endswith(self.EXT):
+                stat = entry.stat()
+                self.entries[entry.name[:-len(self.EXT)]] = (stat.st_mtime, stat.st_size)
+                self.total_bytes += stat.st_size
+            # 異常終了したセッションの一時ファイルは削除する
+            # ※他のプロセスが書き込み中の一時ファイルを消さないよう、古いもののみ
+            elif entry.is_file() and entry.name.endswith(self.TMP_EXT):
+                try:
+                    if now - entry.stat().st_mtime > self.STALE_SECONDS:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+
+    # キーに対応するキャッシュファイルのパス取得
+    # ----------------------------------------------------------------
+    def path_get(self, key):
+        return os.path.join(self.dirpath, key + self.EXT)
+
+    # キャッシュの取得
+    # 戻り値: (メタ情報, 整形済みテキスト)、無いときは None
+    # ----------------------------------------------------------------
+    def get(self, key):
+        with self.lock:
+            if not key in self.entries:
+                self.misses += 1
+                return None
+            path = self.path_get(key)
+            try:
+                with open(path, 'r', encoding='utf-8', newline='') as file:
+                    meta = json.loads(file.readline())
+                    text = file.read()
+            except (OSError, ValueError):
+                # 読めないキャッシュは破棄する
+                self.discard(key)
+                self.misses += 1
+                return None
+            # 最終使用時刻の更新（LRU）
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self.entries[key] = (os.path.getmtime(path), self.entries[key][1])
+            self.hits += 1
+            return (meta, text)
+
+    # キャッシュの保存
+    # ----------------------------------------------------------------
+    def put(self, key, text, meta=None):
+        entry = self.open_entry(key, meta)
+        if entry is None:
+            return
+        entry.write(text)
+        entry.commit()
+
+    # キャッシュの逐次保存の開始（整形済みテキストを溜めずに書き込む）
+    # 戻り値: キャッシュエントリ（write で追記し、commit で確定、abort で破棄する）、作れないときは None
+    # ----------------------------------------------------------------
+    def open_entry(self, key, meta=None):
+        try:
+            return CacheEntry(self, key, meta)
+        except OSError:
+            return None
+
+    # 書き込んだキャッシュファイルの登録
+    # ----------------------------------------------------------------
+    def register(self, key, tmppath):
+        try:
+            path = self.path_get(key)
+            os.replace(tmppath, path)
+            size = os.path.getsize(path)
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries[key][1]
+            self.entries[key] = (mtime, size)
+            self.total_bytes += size
+            self.stores += 1
+            self.evict()
+
+    # キャッシュの削除
+    # ----------------------------------------------------------------
+    def discard(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            try:
+                os.remove(self.path_get(key))
+            except OSError:
+                pass
+
+    # 上限を超えた分を古いものから削除
+    # ----------------------------------------------------------------
+    def evict(self):
+        with self.lock:
+            if self.total_bytes <= self.max_bytes:
+                return
+            for key in sorted(self.entries, key=lambda k: self.entries[k][0]):
+                if self.total_bytes <= self.max_bytes:
+                    break
+                self.discard(key)
+                self.evictions += 1
+
+    # 統計情報の取得
+    # ----------------------------------------------------------------
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+            }
+
+# 逐次書き込み中のキャッシュエントリ
+# ================================================================================================================================
+# 一時ファイルに書き込んでから置き換える（書き込み途中のファイルを読まないため）。
+# 書き込みに失敗したときは commit で破棄する（キャッシュの失敗で出力を止めない）。
+#
+class CacheEntry:
+
+    # コンストラクタ
+    # ----------------------------------------------------------------
+    def __init__(self, cache, key, meta=None):
+        self.cache = cache
+        self.key = key
+        fd, self.tmppath = tempfile.mkstemp(dir=cache.dirpath, suffix=cache.TMP_EXT)
+        self.file = os.fdopen(fd, 'w', encoding='utf-8', newline='')
+        self.failed = False
+        self.write(json.dumps(meta if not meta is None else {}) + "\n")
+
+    # 追記
+    # ----------------------------------------------------------------
+    def write(self, text):
+        if self.failed:
+            return
+        try:
+            self.file.write(text)
+        except OSError:
+            self.failed = True
+
+    # 確定（キャッシュに登録する）
+    # ----------------------------------------------------------------
+    def commit(self):
+        try:
+            self.file.close()
+        except OSError:
+            self.failed = True
+        if self.failed:
+            self.abort()
+            return
+        self.cache.register(self.key, self.tmppath)
+
+    # 破棄
+    # ----------------------------------------------------------------
+    def abort(self):
+        try:
+            self.file.close()
+        except OSError:
+            pass
+        try:
+            os.remove(self.tmppath)
+        except OSError:
+            pass
@@ -0,0 +1,610 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+import gzip
+import itertools
+import numpy as np
+import queue
+import re
+import threading
+
+# VRML バックエンド
+# ================================================================================================================================
+# 中間表現（sceneir.py）を VRML2 テキストに変換して出力します。NumPy のみに依存し、bpy は使いません。
+#
+# ※このモジュールはパッケージ内の他のモジュールを import しない（単独で読み込めるようにする）
+#
+
+# ファイルライター
+# 入れ子構造の開始/終了を明示的に指定してインデントを生成し、出力をバッファに溜めて大きな単位で書き込みます。
+# ================================================================================================================================
+class VrmlWriter:
+
+    # バッファの既定サイズ（文字数）
+    BUFFER_SIZE = 1 << 20
+
+    def __init__(self, file, compact=False, bufsize=BUFFER_SIZE, prof=None):
+        # インデント初期レベル
+        self.indent = 0
+        # ファイル設定
+        self.file = file
+        # コンパクト出力（インデントなし）
+        self.compact = compact
+        # 出力バッファ
+        self.buffer = []
+        self.buffered = 0
+        self.bufsize = bufsize
+        # 行頭か否か
+        self.linehead = True
+        # 取り込み開始位置（取り込み中でないときは None）
+        self.capture = None
+        # 出力内容を並行して書き込む先（キャッシュエントリ等。無いときは None）
+        self.tee = None
+        # 出力した文字数の合計
+        self.written = 0
+        # 計測（ファイルへの書き込み時間を記録する。None のときは計測しない）
+        self.prof = prof
+
+    # バッファへの追加（一定量を超えたらファイルへ書き込む）
+    def write(self, data):
+        if not self.tee is None:
+            self.tee.write(data)
+        self.buffer.append(data)
+        self.buffered += len(data)
+        self.written += len(data)
+        if (self.buffered >= self.bufsize) and (self.capture is None):
+            self.flush()
+
+    # 出力内容の取り込み開始（取り込み中はファイルへ書き込まない）
+    def capture_begin(self):
+        self.capture = len(self.buffer)
+
+    # 出力内容の取り込み終了（取り込み開始以降の出力文字列を返す）
+    def capture_end(self):
+        data = "".join(self.buffer[self.capture:])
+        self.capture = None
+        return data
+
+    # バッファの内容をファイルへ書き込む
+    def flush(self):
+        if len(self.buffer) > 0:
+            if self.prof is None:
+                self.file.write("".join(self.buffer))
+            else:
+                with self.prof.phase("write"):
+                    self.file.write("".join(self.buffer))
+        self.buffer = []
+        self.buffered = 0
+
+    # 現在のインデント文字列取得
+    # ofs: 一時的に加算するインデントレベル
+    def prefix(self, ofs=0):
+        return "" if self.compact else (self.indent + ofs) * "\t"
+
+    # ファイル出力
+    # data: 出力文字列
+    # ofs: 一時的に加算するインデントレベル
+    def print(self, data="", ofs=0):
+        # 空文字列は出力しない
+        if len(data) == 0:
+            return
+        self.write((self.prefix(ofs) if self.linehead else "") + data)
+        self.linehead = data[-1] == "\n"
+
+    # 改行付ファイル出力
+    # data: 出力文字列
+    # ofs: 一時的に加算するインデントレベル
+    def println(self, data="", ofs=0):
+        self.print(data + "\n", ofs=ofs)
+
+    # 入れ子の開始（例: 'Transform {'）
+    def begin(self, data):
+        self.println(data)
+        self.indent += 1
+
+    # 入れ子の終了
+    # newline: Falseのとき改行しない（直後に区切り文字を続ける場合）
+    def end(self, data="}", newline=True):
+        self.indent -= 1
+        if newline:
+            self.println(data)
+        else:
+            self.print(data)
+
+    # 複数行ブロックの出力
+    # data: 各行にインデント済みの出力文字列
+    def printblock(self, data):
+        # 空ブロックは出力しない
+        if len(data) == 0:
+            return
+        self.write(data)
+        self.linehead = data[-1] == "\n"
+
+# 書き込みスレッド付きストリーム（write-behind）
+# 書き込まれた文字列を上限付きのキューに溜め、専用のスレッドでファイルへ書き込み、整形とファイルへの書き込みを並行させます。
+# キューが一杯のときは書き込み側が待ち（背圧）、書き込みスレッドで発生した例外は次の書き込み、または、close で送出します。
+# ※ファイル毎にスレッドを持つので、複数のファイルを同時に書き出すときも互いの書き込み待ちで止まらない
+# ================================================================================================================================
+class WriteBehindStream:
+
+    # 書き込み待ちのチャンク数の上限（超えたときは書き込み側が待つ）
+    QUEUE_SIZE = 8
+
+    def __init__(self, file, name="vrml-write"):
+        self.file = file
+        self.queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        # 書き込みスレッドで発生した例外
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+        self.thread.start()
+
+    # 1チャンクの書き込み（書き込みスレッドで実行）
+    def sink(self, data):
+        self.file.write(data)
+
+    # 全チャンクの書き込み後の終了処理（書き込みスレッドの終了後に実行）
+    def finish(self):
+        pass
+
+    # 書き込みスレッド
+    def run(self):
+        while True:
+            data = self.queue.get()
+            # 終了指示
+            if data is None:
+                break
+            # ※例外の発生後も書き込み側が待たないよう取り出しは続ける
+            if self.error is None:
+                try:
+                    self.sink(data)
+                except BaseException as e:
+                    self.error = e
+
+    # 書き込み（書き込みスレッドへ渡す）
+    def write(self, data):
+        if not self.error is None:
+            raise self.error
+        self.queue.put(data)
+
+    # 書き込みスレッドの終了を待ってファイルを閉じる
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        try:
+            if self.error is None:
+                self.finish()
+        finally:
+            self.file.close()
+        if not self.error is None:
+            raise self.error
+
+# gzip 圧縮ストリーム
+# 書き込まれた文字列を書き込みスレッドで UTF-8 に変換・圧縮してファイルへ書き込み、整形と圧縮を並行させます。
+# 同じ内容から同じファイルが得られるよう、gzip ヘッダーの時刻とファイル名は空にします。
+# ================================================================================================================================
+class GzipStream(WriteBehindStream):
+
+    def __init__(self, file, level=6):
+        try:
+            self.gzip = gzip.GzipFile(filename="", mode='wb', compresslevel=level, fileobj=file, mtime=0)
+        except BaseException:
+            file.close()
+            raise
+        super().__init__(file, name="vrml-gzip")
+
+    # 1チャンクの圧縮と書き込み
+    def sink(self, data):
+        self.gzip.write(data.encode('utf-8'))
+
+    # 圧縮の終端（gzip のフッター）を書き込む
+    def finish(self):
+        self.gzip.close()
+
+# 行書式を配列の全行に適用して1つの文字列ブロックで返す
+# fmt: 1行分の書式（例: "%.6g %.6g %.6g"）
+# rows: 行数 x 列数の配列（numpy.ndarray）
+# prefix: 各行の先頭に付加するインデント文字列
+# last: 最終行以外の行末に付加する区切り文字
+# ================================================================================================================================
+def format_rows(fmt, rows, prefix="", last=","):
+    count = len(rows)
+    # 行が無いときは空文字列
+    if count == 0:
+        return ""
+    # 全行分の書式を連結し、一度の書式変換で文字列化する
+    line = prefix + fmt
+    block = (line + last + "\n") * (count - 1) + line + "\n"
+    return block % tuple(rows.ravel().tolist())
+
+# 小数部末尾の不要な0を取り除く（"1.2500" -> "1.25"、"3.000" -> "3"）
+# ※整数部の0（"100"）は対象外
+# ================================================================================================================================
+TRAILING_ZEROS = re.compile(r"(?:(\.\d*[1-9])0+|\.0+)(?=[ ,\n])")
+
+def strip_zeros(block):
+    return TRAILING_ZEROS.sub(r"\1", block)
+
+# 多角形のインデックス列を1つの文字列ブロックで返す（1行に1つの多角形）
+# polys: 多角形のインデックス配列（-1 区切りの1次元配列）
+# ================================================================================================================================
+def format_polys(polys, prefix="", last=","):
+    if len(polys) == 0:
+        return ""
+    # 区切りの -1 の後で改行する（頂点インデックスは負にならない）
+    text = ", ".join(map(str, polys.tolist()))
+    return prefix + text.replace("-1, ", "-1" + last + "\n" + prefix) + "\n"
+
+# 配列を一定の行数毎に分割（chunk_size が 0 のときは分割しない）
+# ================================================================================================================================
+def row_chunks(rows, chunk_size=0):
+    if (chunk_size <= 0) or (len(rows) <= chunk_size):
+        yield rows
+        return
+    for sta in range(0, len(rows), chunk_size):
+        yield rows[sta:sta + chunk_size]
+
+# 多角形のインデックス配列を一定の多角形数毎に分割（chunk_size が 0 のときは分割しない）
+# ================================================================================================================================
+def poly_chunks(polys, chunk_size=0):
+    if chunk_size <= 0:
+        yield polys
+        return
+    ends = np.flatnonzero(polys < 0)
+    sta = 0
+    for end in ends[chunk_size - 1::chunk_size].tolist() + [len(polys) - 1]:
+        if end + 1 > sta:
+            yield polys[sta:end + 1]
+        sta = end + 1
+
+# 文字列ブロックを順に出力（ブロック間には区切り文字を付加する）
+# 分割して整形したブロックは、1つずつ出力することで整形中の文字列を一定量に抑える。
+# ================================================================================================================================
+def write_blocks(fw, blocks, last=","):
+    pending = None
+    for block in blocks:
+        # 空ブロックは出力しない
+        if len(block) == 0:
+            continue
+        if not pending is None:
+            fw.printblock(pending[:-1] + last + "\n")
+        pending = block
+    if not pending is None:
+        fw.printblock(pending)
+
+# 日本語を含む文字列を半角英数字に置換
+# ================================================================================================================================
+def zen2hex(str):
+    sv = []
+    for x in range(len(str)):
+        ch = str[x]
+        cd = ord(ch)
+        if (cd >= 0) and (cd <= 255):
+            sv.append(ch)
+        else:
+            sv.append(hex(cd)[2:].upper())
+    return "".join(sv)
+
+# VRML用のオブジェクトID取得
+# ================================================================================================================================
+def vrmlid(n, zen=False):
+    if zen:
+        return '_' + zen2hex(n).replace ('.', '_').replace (' ','_')
+    return '_' + str(n).replace ('.', '_').replace (' ','_')
+
+# VRML用のマテリアル名取得
+# ================================================================================================================================
+def materialid(n, zen=False):
+    if zen:
+        return zen2hex(n).replace ('.', '_').replace (' ','-')
+    return str(n).replace ('.', '_').replace (' ','-')
+
+
+# Material の出力行を取得
+# ================================================================================================================================
+def material_lines(mat):
+    # マテリアル定義がないとき
+    if mat.name is None:
+        return ["# No material definition."]
+    return [
+        # マテリアル名(※日本語名は KiCad が認識しない)
+        '# Material %r, %s' % (materialid(mat.name), vrmlid(mat.name)),
+        # 拡散反射色
+        "diffuseColor %.3g %.3g %.3g" % tuple(mat.diffuse),
+        # 光源反射色
+        "emissiveColor %.3g %.3g %.3g" % tuple(mat.emissive),
+        # 鏡面反射色
+        "specularColor %.3g %.3g %.3g" % tuple(mat.specular),
+        # 環境光反射率
+        "ambientIntensity %.3g" % mat.ambient,
+        # 透過率
+        "transparency %.3g" % mat.transparency,
+        # 鏡面反射率
+        "shininess %.3g" % mat.shininess,
+    ]
+
+# Appearance の書き出し
+# ================================================================================================================================
+def write_appearance(fw, mesh):
+    # 出力済みの Appearance を参照するとき
+    if not mesh.appearance_use is None:
+        fw.println('appearance USE %s' % mesh.appearance_use)
+        return
+    if mesh.appearance_def is None:
+        fw.begin('appearance Appearance {')
+    else:
+        fw.begin('appearance DEF %s Appearance {' % mesh.appearance_def)
+    fw.begin('material Material {')
+    for line in material_lines(mesh.material):
+        fw.println(line)
+    fw.end()  # end 'Material'
+    fw.end()  # end 'Appearance'
+
+# ジオメトリ（IndexedFaceSet）の書き出し
+# 整形済みのジオメトリがあるときは配列を使わない。
+# cache: テッセレーションキャッシュ（指定時、キーのあるメッシュは整形結果を保存する）
+# decimals: 頂点座標の小数点以下の桁数（None のときは有効数字6桁）
+# chunk_size: 整形・出力を分割する行数（0 のときは一括）
+# ================================================================================================================================
+def write_geometry(fw, mesh, cache=None, decimals=None, chunk_size=0):
+
+    if mesh.geometry_def is None:
+        fw.begin('geometry IndexedFaceSet {')
+    else:
+        fw.begin('geometry DEF %s IndexedFaceSet {' % mesh.geometry_def)
+
+    # 整形済みのジオメトリがあるとき
+    if not mesh.body is None:
+        fw.printblock(mesh.body)
+        fw.end()       # end 'IndexedFaceSet'
+        return
+
+    capture = (not cache is None) and (not mesh.cache_key is None)
+    entry = None
+    if capture:
+        # 分割出力のときは整形済みテキストを溜めず、キャッシュファイルへ順に書き込む
+        if chunk_size > 0:
+            entry = fw.tee = cache.open_entry(mesh.cache_key, mesh.cache_meta)
+        else:
+            fw.capture_begin()
+    try:
+        write_coord(fw, mesh.co, decimals, chunk_size=chunk_size)
+        write_index(fw, mesh.tris, mesh.polys, chunk_size)
+    except BaseException:
+        if not entry is None:
+            entry.abort()
+        raise
+    finally:
+        fw.tee = None
+    # 整形したジオメトリをキャッシュへ保存
+    if not entry is None:
+        entry.commit()
+    elif capture and (chunk_size <= 0):
+        cache.put(mesh.cache_key, fw.capture_end(), mesh.cache_meta)
+    fw.end()       # end 'IndexedFaceSet'
+
+# 座標（Coordinate）の書き出し
+# coord_def: Coordinate の DEF 名（無いときは None）
+# ================================================================================================================================
+def write_coord(fw, co, decimals=None, coord_def=None, chunk_size=0):
+
+    if coord_def is None:
+        fw.begin('coord Coordinate {')
+    else:
+        fw.begin('coord DEF %s Coordinate {' % coord_def)
+    fw.begin('point [')
+
+    # 座標列の生成
+    write_blocks(fw, (format_coord(chunk, decimals, fw.prefix()) for chunk in row_chunks(co, chunk_size)))
+
+    fw.end(']')  # end 'point'
+    fw.end()  # end 'Coordinate'
+
+# 頂点座標の列を1つの文字列ブロックで返す
+# ================================================================================================================================
+def format_coord(co, decimals=None, prefix=""):
+    if decimals is None:
+        # 丸め誤差をゼロにスナップする（元の頂点座標は書き換えない）
+        # ※倍精度で比較しないと閾値付近の値が従来出力と一致しない
+        co = co.astype(np.float64)
+        co[np.abs(co) < 0.00001] = 0
+        return format_rows("%.6g %.6g %.6g", co, prefix)
+    # 量子化済みの座標を固定桁で書式化し、末尾の0をまとめて取り除く
+    fmt = "%.{0}f %.{0}f %.{0}f".format(decimals)
+    return strip_zeros(format_rows(fmt, co, prefix))
+
+# 座標インデックス（coordIndex）の書き出し
+# 多角形（1行に1つ）に続けて三角形を出力する
+# ================================================================================================================================
+def write_index(fw, tris, polys=None, chunk_size=0):
+
+    # 座標インデックスの列生成
+    fw.begin('coordIndex [')
+    prefix = fw.prefix()
+    blocks = []
+    if not polys is None:
+        blocks = (format_polys(chunk, prefix) for chunk in poly_chunks(polys, chunk_size))
+    write_blocks(fw, itertools.chain(blocks,
+                 (format_rows("%d, %d, %d, -1", chunk, prefix) for chunk in row_chunks(tris, chunk_size))))
+
+    fw.end(']')    # end 'coordIndex'
+
+# マテリアル毎の部分のジオメトリの書き出し
+# 頂点座標は最初の部分で DEF し、以降の部分は USE する。
+# ================================================================================================================================
+def write_part_geometry(fw, mesh, part, first, decimals=None, chunk_size=0):
+
+    if part.geometry_def is None:
+        fw.begin('geometry IndexedFaceSet {')
+    else:
+        fw.begin('geometry DEF %s IndexedFaceSet {' % part.geometry_def)
+
+    if first:
+        write_coord(fw, mesh.co, decimals, mesh.coord_def, chunk_size)
+    else:
+        fw.println('coord USE %s' % mesh.coord_def)
+    write_index(fw, part.tris, part.polys, chunk_size)
+
+    fw.end()       # end 'IndexedFaceSet'
+
+# シェイプの書き出し
+# ================================================================================================================================
+def write_shape(fw, mesh, cache=None, decimals=None, chunk_size=0):
+
+    fw.println("# %r (%s)" % (mesh.name, vrmlid(mesh.name)))
+
+    # トランスフォームを頂点座標に適用済みのときは Transform を出力しない
+    baked = len(mesh.translation) + len(mesh.rotation) + len(mesh.scale) == 0
+    if not baked:
+        fw.begin('Transform {')
+
+        for loc in mesh.translation:
+            fw.println("translation %g %g %g" % loc)
+        for rot in mesh.rotation:
+            fw.println("rotation %g %g %g %g" % rot)
+        for sca in mesh.scale:
+            fw.println("scale %g %g %g" % sca)
+
+        fw.begin('children [')
+
+    # 参照するジオメトリの位置をずらすとき
+    shifted = (not mesh.offset is None) and np.any(mesh.offset != 0)
+    if shifted:
+        fw.begin('Transform {')
+        fw.println("translation %.6g %.6g %.6g" % tuple(mesh.offset))
+        fw.begin('children [')
+
+    # 最も外側のノードが Shape のときは末尾で改行しない（直後に区切り文字を続ける）
+    outer = baked and not shifted
+
+    # マテリアル毎に分割しないとき
+    if mesh.parts is None:
+        fw.begin('Shape {')
+
+        write_appearance(fw, mesh)
+
+        # 定義済みジオメトリを参照するとき
+        if (mesh.co is None) and (mesh.body is None):
+            fw.println('geometry USE %s' % mesh.geometry_def)
+        else:
+            write_geometry(fw, mesh, cache, decimals, chunk_size)
+
+        fw.end('}', newline=not outer)       # end 'Shape'
+    else:
+        # マテリアル毎に Shape を出力
+        for inx, part in enumerate(mesh.parts):
+            fw.begin('Shape {')
+
+            write_appearance(fw, part)
+
+            # 定義済みジオメトリを参照するとき
+            if mesh.co is None:
+                fw.println('geometry USE %s' % part.geometry_def)
+            else:
+                write_part_geometry(fw, mesh, part, inx == 0, decimals, chunk_size)
+
+            # end 'Shape'
+            if inx < len(mesh.parts) - 1:
+                fw.end('},')
+            else:
+                fw.end('}', newline=not outer)
+
+    if shifted:
+        fw.end(']')    # end 'children'
+        fw.end('}', newline=not baked)       # end 'Transform'
+
+    if not baked:
+        fw.end(']')    # end 'children'
+        fw.end('}', newline=False)  # end 'Transform'
+
+# シェイプの出力ノード数を取得
+# Transform、Shape、Appearance、Material、IndexedFaceSet、Coordinate の数（USE による参照は数えない）
+# ================================================================================================================================
+def count_nodes(mesh):
+    count = 0
+    # Transform（頂点座標に適用済みのときは無し）と位置をずらす Transform
+    if len(mesh.translation) + len(mesh.rotation) + len(mesh.scale) > 0:
+        count += 1
+    if (not mesh.offset is None) and np.any(mesh.offset != 0):
+        count += 1
+    shapes = [mesh] if mesh.parts is None else mesh.parts
+    for inx, shape in enumerate(shapes):
+        # Shape
+        count += 1
+        # Appearance と Material
+        if shape.appearance_use is None:
+            count += 2
+        # IndexedFaceSet と Coordinate（部分間では Coordinate を共有する）
+        if not mesh.co is None or not mesh.body is None:
+            count += 2 if inx == 0 else 1
+    return count
+
+# シーンの書き出し
+# 戻り値: メッシュ毎の出力文字数のリスト
+# ================================================================================================================================
+def write_scene(fw, scene, cache=None):
+    sizes = []
+
+    # VRML2 エントリ書込み
+    fw.println('#VRML V2.0 utf8')
+    fw.println('#modeled using blender3d http://blender.org')
+
+    # プリミティブ定義開始
+    fw.println()
+    fw.begin("Group {")
+    fw.begin("children [")
+
+    for mesh in scene.meshes:
+        start = fw.written
+
+        # シェイプの書き出し
+        write_shape(fw, mesh, cache, scene.decimals, scene.chunk_size)
+
+        # end 'Shape'
+        fw.println('%s' % (mesh.last))
+        sizes.append(fw.written - start)
+
+    # プリミティブ定義終了
+    fw.end("]")
+    fw.end("}")
+    return sizes
+
+# シーンをファイルに出力
+# compact: インデントを省略するか否か
+# cache: テッセレーションキャッシュ（None のときは保存しない）
+# prof: 計測（None のときは計測しない）
+# compress_level: gzip の圧縮レベル（None のときは圧縮しない）
+# 戻り値: メッシュ毎の出力文字数のリスト
+# ※ファイルへの書き込みは書き込みスレッドで行う（計測の write は書き込みスレッドへ渡すまでの待ち時間になる）
+# ================================================================================================================================
+def save_scene(filepath, scene, compact=False, cache=None, prof=None, compress_level=None):
+    if compress_level is None:
+        file = WriteBehindStream(open(filepath, 'w', encoding='utf-8'))
+    else:
+        file = GzipStream(open(filepath, 'wb'), compress_level)
+    try:
+        fw = VrmlWriter(file, compact=compact, prof=prof)
+        sizes = write_scene(fw, scene, cache)
+        # バッファの残りを書き込む
+        fw.flush()
+    finally:
+        file.close()
+    return sizes
+
+# ================================================================================================================================
@@ -0,0 +1,320 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+#
+# メッシュ配列の処理（meshops.py）のテストです。bpy を使わないので、通常の Python（NumPy が必要）で実行できます。
+#
+# 実行方法:
+#   python -m pytest tests
+#   python -m unittest discover tests
+# ================================================================================================================================
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# meshops は bpy に依存しないので、パッケージを経由せずに直接読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "io_scene_kicad"))
+import meshops
+
+# ================================================================================================================================
+class StepDecimalsTest(unittest.TestCase):
+
+    # 格子間隔を表すのに必要な小数点以下の桁数
+    def test_decimals(self):
+        self.assertEqual([meshops.step_decimals(step) for step in (1, 0.5, 0.25, 0.1, 0.001, 2.5e-5)], [0, 1, 2, 1, 3, 6])
+
+    # 上限の桁数で打ち切る
+    def test_limit(self):
+        self.assertEqual(meshops.step_decimals(0.123456789, limit=4), 4)
+
+# ================================================================================================================================
+class QuantizeTest(unittest.TestCase):
+
+    # 丸めて同じになった頂点を最初に現れた順にまとめ、-0 を 0 にする
+    def test_merge(self):
+        co = np.array([[-0.0001, 0.0012, 0], [0.0004, 0.0009, 0], [1, 1, 1], [0.9998, 1.0004, 1.0001]], dtype=np.float32)
+        tris = np.array([[0, 1, 2], [0, 2, 3]], dtype=np.int32)
+        polys = np.array([0, 1, 2, 3, -1], dtype=np.int32)
+        co, tris, polys, merged = meshops.quantize(co, tris, 0.001, polys)
+        self.assertEqual(merged, 2)
+        np.testing.assert_array_equal(co, [[0, 0.001, 0], [1, 1, 1]])
+        self.assertFalse(np.any(np.signbit(co)))
+        np.testing.assert_array_equal(tris, [[0, 0, 1], [0, 1, 1]])
+        np.testing.assert_array_equal(polys, [0, 0, 1, 1, -1])
+
+    # 空のメッシュ
+    def test_empty(self):
+        co, tris, polys, merged = meshops.quantize(np.zeros((0, 3)), np.zeros((0, 3), dtype=np.int32), 0.001)
+        self.assertEqual((len(co), len(tris), polys, merged), (0, 0, None, 0))
+
+# ================================================================================================================================
+class DropCollapsedTest(unittest.TestCase):
+
+    # 同じ頂点を含む三角形を取り除き、値も一緒に取り除く
+    def test_triangles(self):
+        tris = np.array([[0, 1, 2], [0, 0, 1], [1, 2, 2], [3, 1, 3], [3, 4, 5]], dtype=np.int32)
+        labels = np.array([10, 11, 12, 13, 14], dtype=np.int32)
+        tris, polys, labels, _, dropped = meshops.drop_collapsed(tris, tri_labels=labels)
+        np.testing.assert_array_equal(tris, [[0, 1, 2], [3, 4, 5]])
+        np.testing.assert_array_equal(labels, [10, 14])
+        self.assertIsNone(polys)
+        self.assertEqual(dropped, 3)
+
+    # 多角形は連続する同じ頂点を1つにし、3頂点未満・同じ頂点を含むものを取り除く
+    def test_polygons(self):
+        tris = np.zeros((0, 3), dtype=np.int32)
+        polys = np.array([
+            0, 1, 2, 3, -1,     # そのまま
+            0, 0, 1, 2, -1,     # 三角形になる
+            5, 6, 7, 5, -1,     # 先頭と末尾が同じ（巡回順で連続）
+            4, 4, 4, 4, -1,     # 1点に潰れる
+            0, 1, 1, 0, -1,     # 2頂点になる
+            0, 1, 0, 2, -1,     # 同じ頂点を含む
+        ], dtype=np.int32)
+        labels = np.arange(6, dtype=np.int32)
+        _, polys, _, labels, dropped = meshops.drop_collapsed(tris, polys, poly_labels=labels)
+        np.testing.assert_array_equal(polys, [0, 1, 2, 3, -1, 0, 1, 2, -1, 6, 7, 5, -1])
+        self.assertEqual(polys.dtype, np.int32)
+        np.testing.assert_array_equal(labels, [0, 1, 2])
+        self.assertEqual(dropped, 3)
+
+    # 潰れた面が無いときはそのまま
+    def test_unchanged(self):
+        tris = np.array([[0, 1, 2]], dtype=np.int32)
+        polys = np.array([0, 1, 2, 3, -1], dtype=np.int32)
+        result, result_polys, _, _, dropped = meshops.drop_collapsed(tris, polys)
+        np.testing.assert_array_equal(result, tris)
+        np.testing.assert_array_equal(result_polys, polys)
+        self.assertEqual(dropped, 0)
+
+# ================================================================================================================================
+class CleanupTest(unittest.TestCase):
+
+    # 面積ゼロ・重複した三角形と未使用の頂点を取り除き、残した三角形の値（labels）を保つ
+    def test_degenerate_duplicate_unused(self):
+        co = np.array([
+            [0, 0, 0], [1, 0, 0], [0, 1, 0],   # 0-2: 三角形
+            [2, 0, 0],                         # 3: 一直線上の頂点
+            [5, 5, 5],                         # 4: 未使用
+            [1, 1, 0],                         # 5
+        ], dtype=np.float32)
+        tris = np.array([
+            [0, 1, 2],     # 残す
+            [0, 0, 1],     # 同じ頂点を含む（面積ゼロ）
+            [0, 1, 3],     # 一直線上（面積ゼロ）
+            [1, 2, 0],     # [0, 1, 2] を巡回させたもの（重複）
+            [2, 1, 0],     # 裏向き（重複ではない）
+            [1, 5, 2],     # 残す
+        ], dtype=np.int32)
+        labels = np.array([10, 11, 12, 13, 14, 15], dtype=np.int32)
+        co2, tris2, polys2, labels2, removed = meshops.cleanup(co, tris, None, labels)
+        self.assertEqual(removed, {"degenerate": 2, "duplicate": 1, "unused": 2})
+        np.testing.assert_array_equal(co2, [[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0]])
+        np.testing.assert_array_equal(tris2, [[0, 1, 2], [2, 1, 0], [1, 3, 2]])
+        np.testing.assert_array_equal(labels2, [10, 14, 15])
+        self.assertIsNone(polys2)
+
+    # 多角形は削除せず、使っている頂点を残してインデックスを付け替える
+    def test_polys_keep_vertices(self):
+        co = np.array([[0, 0, 0], [9, 9, 9], [1, 0, 0], [1, 1, 0], [0, 1, 0], [2, 0, 0]], dtype=np.float32)
+        tris = np.array([[0, 2, 5]], dtype=np.int32)
+        polys = np.array([0, 2, 3, 4, -1], dtype=np.int32)
+        co2, tris2, polys2, _, removed = meshops.cleanup(co, tris, polys)
+        self.assertEqual(removed, {"degenerate": 1, "duplicate": 0, "unused": 2})
+        self.assertEqual(len(tris2), 0)
+        np.testing.assert_array_equal(polys2, [0, 1, 2, 3, -1])
+        np.testing.assert_array_equal(co2, [[0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0]])
+
+# ================================================================================================================================
+class CompactTest(unittest.TestCase):
+
+    # 未使用の頂点を取り除き、インデックスを詰め直す（区切りの -1 はそのまま）
+    def test_remove_unused(self):
+        co = np.arange(18, dtype=np.float32).reshape(6, 3)
+        tris = np.array([[5, 3, 1]], dtype=np.int32)
+        polys = np.array([1, 3, 4, -1], dtype=np.int32)
+        co2, tris2, polys2 = meshops.compact(co, tris, polys)
+        np.testing.assert_array_equal(co2, co[[1, 3, 4, 5]])
+        np.testing.assert_array_equal(tris2, [[3, 1, 0]])
+        np.testing.assert_array_equal(polys2, [0, 1, 2, -1])
+
+    # 全頂点を使っているときは同じ配列を返す
+    def test_all_used(self):
+        co = np.zeros((3, 3), dtype=np.float32)
+        tris = np.array([[0, 1, 2]], dtype=np.int32)
+        co2, tris2, polys2 = meshops.compact(co, tris)
+        self.assertIs(co2, co)
+        self.assertIs(tris2, tris)
+        self.assertIsNone(polys2)
+
+# 面のリストからループの配列（頂点インデックス, 開始位置, ループ数）を作成
+# ================================================================================================================================
+def loops(faces):
+    loop_total = np.array([len(face) for face in faces], dtype=np.int32)
+    loop_start = (np.cumsum(loop_total) - loop_total).astype(np.int32)
+    loop_vertices = np.array([index for face in faces for index in face], dtype=np.int32)
+    return (loop_vertices, loop_start, loop_total)
+
+# ================================================================================================================================
+class FlatConvexTest(unittest.TestCase):
+
+    CO = np.array([
+        [0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],   # 0-3: 正方形
+        [0.5, 0.2, 0],                                 # 4: 凹ませる頂点
+        [1, 1, 0.5],                                   # 5: 平面から外れた頂点
+        [2, 0.5, 0],                                   # 6: 凸の五角形の頂点
+        [1, 0, 0],                                     # 7: 頂点 1 と同じ位置
+    ], dtype=np.float32)
+
+    def check(self, faces):
+        return meshops.flat_convex(self.CO, *loops(faces)).tolist()
+
+    # 平面かつ凸の四角形・五角形のみ True（三角形は対象外）
+    def test_flat_convex(self):
+        self.assertEqual(self.check([[0, 1, 2, 3], [0, 1, 6, 2, 3], [0, 1, 2]]), [True, True, False])
+
+    # 凹んだ面
+    def test_concave(self):
+        self.assertEqual(self.check([[0, 1, 4, 3], [0, 1, 2, 3]]), [False, True])
+
+    # 平面でない面
+    def test_non_planar(self):
+        self.assertEqual(self.check([[0, 1, 5, 3]]), [False])
+
+    # 同じ頂点・同じ位置の頂点が続く面
+    def test_duplicate_index(self):
+        self.assertEqual(self.check([[0, 1, 2, 2], [0, 1, 1, 2, 3], [0, 1, 7, 2, 3]]), [False, False, False])
+
+    # 空の入力
+    def test_empty(self):
+        self.assertEqual(self.check([]), [])
+
+# ================================================================================================================================
+class PolygonStreamTest(unittest.TestCase):
+
+    # 選択した面のループを -1 区切りで並べる（ループの並びが面の順でなくてもよい）
+    def test_stream(self):
+        loop_vertices = np.array([7, 8, 9, 0, 1, 2, 3, 4, 5, 6, 10], dtype=np.int32)
+        loop_start = np.array([3, 0, 7], dtype=np.int32)
+        loop_total = np.array([4, 3, 4], dtype=np.int32)
+        mask = np.array([True, False, True])
+        stream = meshops.polygon_stream(loop_vertices, loop_start, loop_total, mask)
+        self.assertEqual(stream.dtype, np.int32)
+        np.testing.assert_array_equal(stream, [0, 1, 2, 3, -1, 4, 5, 6, 10, -1])
+
+    # 選択した面が無いときは空
+    def test_none_selected(self):
+        stream = meshops.polygon_stream(*loops([[0, 1, 2, 3]]), np.array([False]))
+        self.assertEqual(len(stream), 0)
+
+# ================================================================================================================================
+class TransformTest(unittest.TestCase):
+
+    # 移動・拡大縮小を含む変換
+    def test_transform(self):
+        co = np.array([[1, 2, 3], [0, 0, 0]], dtype=np.float32)
+        matrix = [[2, 0, 0, 10], [0, 3, 0, 20], [0, 0, 4, 30], [0, 0, 0, 1]]
+        np.testing.assert_array_equal(meshops.transform(co, matrix), [[12, 26, 42], [10, 20, 30]])
+
+# ================================================================================================================================
+class FlipWindingTest(unittest.TestCase):
+
+    # 三角形は各行の逆順、多角形は区切りの -1 を残して多角形毎に逆順
+    def test_flip(self):
+        tris = np.array([[0, 1, 2], [3, 4, 5]], dtype=np.int32)
+        polys = np.array([0, 1, 2, 3, -1, 4, 5, 6, -1], dtype=np.int32)
+        tris, polys = meshops.flip_winding(tris, polys)
+        np.testing.assert_array_equal(tris, [[2, 1, 0], [5, 4, 3]])
+        np.testing.assert_array_equal(polys, [3, 2, 1, 0, -1, 6, 5, 4, -1])
+
+    # 鏡像の変換（行列式が負）で座標から求めた法線が反転し、巡回順の反転で元の向きに戻る
+    def test_mirror(self):
+        co = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0]], dtype=np.float32)
+        tris = np.array([[0, 1, 2]], dtype=np.int32)
+        matrix = np.diag([-1.0, 1.0, 1.0, 1.0])
+        self.assertLess(np.linalg.det(matrix[:3, :3]), 0)
+        co = meshops.transform(co, matrix)
+        tris, polys = meshops.flip_winding(tris)
+        self.assertIsNone(polys)
+        v0, v1, v2 = co[tris[0]]
+        np.testing.assert_array_equal(np.cross(v1 - v0, v2 - v0), [0, 0, 1])
+
+# ================================================================================================================================
+class MergeTest(unittest.TestCase):
+
+    # 先行する頂点数をインデックスに加える（多角形の区切りの -1 はそのまま）
+    def test_offsets(self):
+        co1 = np.zeros((3, 3), dtype=np.float32)
+        co2 = np.ones((4, 3), dtype=np.float32)
+        co3 = np.full((3, 3), 2.0)
+        tris1 = np.array([[0, 1, 2]], dtype=np.int32)
+        tris2 = np.array([[0, 1, 2]], dtype=np.int32)
+        tris3 = np.array([[2, 1, 0]], dtype=np.int32)
+        polys2 = np.array([0, 1, 2, 3, -1], dtype=np.int32)
+        co, tris, polys = meshops.merge([(co1, tris1, None), (co2, tris2, polys2), (co3, tris3, None)])
+        self.assertEqual(co.shape, (10, 3))
+        np.testing.assert_array_equal(co[:, 0], [0, 0, 0, 1, 1, 1, 1, 2, 2, 2])
+        self.assertEqual(tris.dtype, np.int32)
+        np.testing.assert_array_equal(tris, [[0, 1, 2], [3, 4, 5], [9, 8, 7]])
+        self.assertEqual(polys.dtype, np.int32)
+        np.testing.assert_array_equal(polys, [3, 4, 5, 6, -1])
+
+    # 多角形を含むジオメトリが無いとき
+    def test_no_polys(self):
+        co, tris, polys = meshops.merge([(np.zeros((3, 3)), np.array([[0, 1, 2]]), None),
+                                         (np.zeros((3, 3)), np.array([[0, 2, 1]]), None)])
+        np.testing.assert_array_equal(tris, [[0, 1, 2], [3, 5, 4]])
+        self.assertIsNone(polys)
+
+# ================================================================================================================================
+class SplitFacesTest(unittest.TestCase):
+
+    # 値の昇順に分け、値毎の三角形・多角形は元の順序を保つ
+    def test_order(self):
+        tris = np.array([[0, 1, 2], [3, 4, 5], [6, 7, 8], [9, 10, 11], [12, 13, 14]], dtype=np.int32)
+        tri_labels = np.array([2, 0, 2, 0, 2], dtype=np.int32)
+        polys = np.array([0, 1, 2, 3, -1, 4, 5, 6, 7, -1, 8, 9, 10, 11, -1], dtype=np.int32)
+        poly_labels = np.array([1, 0, 1], dtype=np.int32)
+        parts = meshops.split_faces(tris, tri_labels, polys, poly_labels)
+        self.assertEqual([value for value, _, _ in parts], [0, 1, 2])
+        value, part_tris, part_polys = parts[0]
+        np.testing.assert_array_equal(part_tris, [[3, 4, 5], [9, 10, 11]])
+        np.testing.assert_array_equal(part_polys, [4, 5, 6, 7, -1])
+        value, part_tris, part_polys = parts[1]
+        self.assertEqual(part_tris.shape, (0, 3))
+        np.testing.assert_array_equal(part_polys, [0, 1, 2, 3, -1, 8, 9, 10, 11, -1])
+        value, part_tris, part_polys = parts[2]
+        np.testing.assert_array_equal(part_tris, [[0, 1, 2], [6, 7, 8], [12, 13, 14]])
+        self.assertEqual(len(part_polys), 0)
+
+    # 多角形が無いとき
+    def test_no_polys(self):
+        tris = np.array([[0, 1, 2], [3, 4, 5]], dtype=np.int32)
+        parts = meshops.split_faces(tris, np.array([1, 1], dtype=np.int32))
+        self.assertEqual(len(parts), 1)
+        value, part_tris, part_polys = parts[0]
+        self.assertEqual(value, 1)
+        np.testing.assert_array_equal(part_tris, tris)
+        self.assertIsNone(part_polys)
+
+if __name__ == "__main__":
+    unittest.main()
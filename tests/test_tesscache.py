@@ -0,0 +1,61 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+#
+# テッセレーションキャッシュ（tesscache.py）のテストです。bpy を使わないので、通常の Python で実行できます。
+#
+# 実行方法:
+#   python -m pytest tests
+#   python -m unittest discover tests
+# ================================================================================================================================
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+# tesscache は bpy に依存しないので、パッケージを経由せずに直接読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "io_scene_kicad"))
+import tesscache
+
+# ================================================================================================================================
+class ScanTest(unittest.TestCase):
+
+    # 既存のキャッシュファイルを登録し、古い一時ファイルのみ削除する
+    def test_stale_temp_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            def touch(name, age=0):
+                path = os.path.join(tmpdir, name)
+                with open(path, 'w', encoding='utf-8') as file:
+                    file.write("{}\n")
+                mtime = time.time() - age
+                os.utime(path, (mtime, mtime))
+                return path
+            stale = touch("stale" + tesscache.TessCache.TMP_EXT, tesscache.TessCache.STALE_SECONDS * 2)
+            fresh = touch("fresh" + tesscache.TessCache.TMP_EXT)
+            touch("key" + tesscache.TessCache.EXT, tesscache.TessCache.STALE_SECONDS * 2)
+            cache = tesscache.TessCache(tmpdir, 1 << 20)
+            self.assertFalse(os.path.exists(stale))
+            self.assertTrue(os.path.exists(fresh))
+            self.assertEqual(list(cache.entries), ["key"])
+            self.assertEqual(cache.get("key"), ({}, ""))
+
+if __name__ == "__main__":
+    unittest.main()
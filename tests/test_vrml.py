@@ -0,0 +1,141 @@
+# GNU GENERAL PUBLIC LICENSE
+# Version 3, 29 June 2007
+#
+# This file is part of io_scene_kicad.
+# Copyright (C) 2024  Hideki Matsunobu
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+#
+# ================================================================================================================================
+#
+# VRML バックエンド（vrml.py）のテストです。bpy を使わないので、通常の Python（NumPy が必要）で実行できます。
+#
+# 実行方法:
+#   python -m pytest tests
+#   python -m unittest discover tests
+# ================================================================================================================================
+import gzip
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+
+import numpy as np
+
+# バックエンドは bpy に依存しないので、パッケージを経由せずに直接読み込む
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "io_scene_kicad"))
+import sceneir
+import tesscache
+import vrml
+
+# テスト用のシーン（格子状の頂点と三角形のメッシュ）
+# ================================================================================================================================
+def build_scene(side=32, meshes=2):
+    scene = sceneir.SceneIR()
+    grid = np.arange(side, dtype=np.float32) * np.float32(0.1234567)
+    xs, ys = np.meshgrid(grid, grid)
+    base = (np.arange(side - 1)[:, None] * side + np.arange(side - 1)[None, :]).ravel()
+    tris = np.concatenate([
+        np.stack([base, base + 1, base + side], axis=1),
+        np.stack([base + 1, base + side + 1, base + side], axis=1),
+    ]).astype(np.int32)
+    for inx in range(meshes):
+        mesh = scene.add(sceneir.MeshRecord("Mesh%d" % inx))
+        mesh.translation.append((inx, 0, 0))
+        mesh.rotation.append((0, 0, 1, 0))
+        mesh.co = np.stack([xs.ravel(), ys.ravel(), np.sin(xs.ravel() * ys.ravel() + inx)], axis=1).astype(np.float32)
+        mesh.tris = tris
+        mesh.last = "," if inx < meshes - 1 else ""
+    return scene
+
+# ================================================================================================================================
+class GzipOutputTest(unittest.TestCase):
+
+    # 圧縮出力を展開した内容は非圧縮の出力と同じ
+    def test_decompressed_matches_plain(self):
+        scene = build_scene()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            plain_path = os.path.join(tmpdir, "scene.wrl")
+            gz_path = os.path.join(tmpdir, "scene.wrl.gz")
+            vrml.save_scene(plain_path, scene)
+            vrml.save_scene(gz_path, scene, compress_level=6)
+            # ※非圧縮の出力はテキストモードで書くので、改行を統一して読み込む（Windows の CRLF）
+            with open(plain_path, 'r', encoding='utf-8') as file:
+                plain = file.read().encode('utf-8')
+            with open(gz_path, 'rb') as file:
+                gz = file.read()
+        self.assertGreater(len(plain), 0)
+        self.assertEqual(gzip.decompress(gz), plain)
+
+# 書き込み内容を捨てるファイル（ファイル I/O をメモリ計測に含めない）
+# ================================================================================================================================
+class NullFile:
+    def write(self, data):
+        pass
+
+# ================================================================================================================================
+class ChunkedOutputTest(unittest.TestCase):
+
+    CHUNK_SIZE = 1024
+    BUFFER_SIZE = 1 << 16
+
+    # シーンを出力したときのメモリ使用量のピーク（バイト）
+    def peak(self, scene, chunk_size, cache=None):
+        scene.chunk_size = chunk_size
+        tracemalloc.start()
+        try:
+            # ※出力バッファが小さいメッシュの出力全体より大きいとピークが頭打ちにならないので小さくする
+            fw = vrml.VrmlWriter(NullFile(), bufsize=self.BUFFER_SIZE)
+            vrml.write_scene(fw, scene, cache)
+            fw.flush()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    # 分割出力の内容は一括出力と同じ
+    def test_output_matches_whole(self):
+        scene = build_scene(side=40)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for chunk_size in (0, 1, 7, 64):
+                path = os.path.join(tmpdir, "scene%d.wrl" % chunk_size)
+                scene.chunk_size = chunk_size
+                vrml.save_scene(path, scene)
+            with open(os.path.join(tmpdir, "scene0.wrl"), 'rb') as file:
+                whole = file.read()
+            for chunk_size in (1, 7, 64):
+                with open(os.path.join(tmpdir, "scene%d.wrl" % chunk_size), 'rb') as file:
+                    self.assertEqual(file.read(), whole)
+
+    # 分割出力のメモリ使用量のピークはメッシュの大きさに依存しない（キャッシュへの保存を含む）
+    def test_peak_memory_bounded(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = tesscache.TessCache(tmpdir, 1 << 30)
+            peaks = []
+            for side in (80, 320):
+                scene = build_scene(side=side, meshes=1)
+                scene.meshes[0].cache_key = "chunked%d" % side
+                scene.meshes[0].cache_meta = {}
+                peaks.append(self.peak(scene, self.CHUNK_SIZE, cache))
+            scene.meshes[0].cache_key = "whole"
+            whole = self.peak(scene, 0, cache)
+            # キャッシュには一括出力と同じ内容を保存する
+            self.assertEqual(cache.get("chunked320")[1], cache.get("whole")[1])
+        # 頂点数が16倍でもピークはほぼ同じ、かつ、一括出力より十分小さい
+        self.assertLess(peaks[1], peaks[0] * 1.5)
+        self.assertLess(peaks[1] * 4, whole)
+
+if __name__ == "__main__":
+    unittest.main()